@@ -0,0 +1,280 @@
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+# Stages of generate_sources which are timed separately, in the order in
+# which they are run.
+stages = [
+    # Importing sympy and the formulas of all polygons.
+    'import',
+    # Enumerating the decisions, without evaluating any formulas.
+    'enumerate',
+    # Building the sympy expressions describing each polygon.
+    'geometry',
+    # Evaluating the corners and edges of the polygons numerically and
+    # checking them using validate_polygon().
+    'validation',
+    # Evaluating the expressions numerically for the fillygon() calls.
+    'arguments',
+    # Converting the expressions to LaTeX for the metadata.
+    'metadata',
+    # Serializing the fillygon() calls using fillygon_call().
+    'content',
+    # Writing the files, which are left alone if they did not change.
+    'write',
+    # Writing the metadata to the JSON file and the SQLite catalog.
+    'catalog']
+
+# Scenarios which can be run. In the cold scenario, each run starts without
+# an expression cache and with an empty output directory. In the warm
+# scenario, both are left over from a previous run, as when regenerating
+# the files after a small change.
+scenarios = ['cold', 'warm']
+
+# Stages faster than this in the baseline are not checked for regressions,
+# as their timings are dominated by noise.
+min_checked_seconds = 0.05
+
+
+def measure_stages(output_dir):
+    """
+    Generate all files into output_dir and return the time in seconds spent
+    in each stage, keyed by the stage's name.
+
+    The expression cache is loaded from and saved to output_dir.
+    """
+    # Imported here so that the imports are part of the measurement.
+    from fillygons.utils.deciders import iter_decisions
+    from fillygons.utils.expressions import persistent_cache
+
+    timings = {}
+    start = time.perf_counter()
+
+    def stage(name):
+        nonlocal start
+
+        end = time.perf_counter()
+        timings[name] = end - start
+        start = end
+
+    # Imports sympy and the formulas, which would otherwise be imported
+    # when the first polygon's geometry is computed.
+    import fillygons.generate_sources.geometry
+    import fillygons.generate_sources.validation
+    from fillygons.generate_sources.catalog import CatalogWriter
+    from fillygons.generate_sources.utils import write_text_file, \
+        JsonListWriter
+    from fillygons.generate_sources.variants import iter_files, \
+        decide_polygon
+    from fillygons.utils.expressions import evaluate_float
+    from sympy import Expr
+
+    stage('import')
+
+    cache_path = os.path.join(output_dir, 'expression-cache.json')
+
+    with persistent_cache(cache_path):
+        files = list(iter_files())
+        polygons = list(iter_decisions(decide_polygon))
+        stage('enumerate')
+
+        # The geometry is kept by each polygon, so it is only computed once.
+        for i in polygons:
+            i.geometry
+
+        stage('geometry')
+
+        # Checked only once as well, so that the later stages do not repeat
+        # the checks.
+        for i in polygons:
+            i.checked_geometry
+
+        stage('validation')
+
+        # The arguments contain expressions, which are otherwise only
+        # evaluated when serializing the calls.
+        for i in files:
+            for value in (i.arguments or {}).values():
+                for j in value if isinstance(value, list) else [value]:
+                    if isinstance(j, Expr):
+                        evaluate_float(j)
+
+        stage('arguments')
+
+        metadata = [i.metadata for i in files]
+        stage('metadata')
+
+        contents = [(i.path, i.content) for i in files]
+        stage('content')
+
+        for path, content in contents:
+            write_text_file(os.path.join(output_dir, path), content)
+
+        stage('write')
+
+        with JsonListWriter(os.path.join(output_dir, 'variants.json')) \
+                as metadata_writer, \
+                CatalogWriter(os.path.join(output_dir, 'variants.sqlite')) \
+                as catalog_writer:
+            for i in metadata:
+                if i is not None:
+                    metadata_writer.append(i)
+                    catalog_writer.append(i)
+
+        stage('catalog')
+
+    return timings
+
+
+def _measure_in_new_process(output_dir):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Uses a fresh interpreter so that nothing is cached in memory between
+    # runs, e.g. by sympy.
+    context = multiprocessing.get_context('spawn')
+
+    with ProcessPoolExecutor(1, mp_context=context) as executor:
+        return executor.submit(measure_stages, output_dir).result()
+
+
+def run_scenario(scenario, repeat):
+    """
+    Run the scenario the specified number of times and return the median
+    time spent in each stage.
+    """
+    runs = []
+
+    with tempfile.TemporaryDirectory() as warm_dir:
+        if scenario == 'warm':
+            _measure_in_new_process(warm_dir)
+
+        for _ in range(repeat):
+            if scenario == 'warm':
+                runs.append(_measure_in_new_process(warm_dir))
+            else:
+                with tempfile.TemporaryDirectory() as cold_dir:
+                    runs.append(_measure_in_new_process(cold_dir))
+
+    return {i: statistics.median(j[i] for j in runs) for i in stages}
+
+
+def find_regressions(results, baseline, threshold, min_seconds=None):
+    """
+    Return a list of messages describing each stage which became slower than
+    in the baseline by more than the specified fraction.
+
+    Stages which took less than min_seconds in the baseline are ignored,
+    which defaults to min_checked_seconds.
+    """
+    if min_seconds is None:
+        min_seconds = min_checked_seconds
+
+    messages = []
+
+    for scenario, timings in sorted(results.items()):
+        baseline_timings = baseline.get(scenario, {})
+
+        for stage, seconds in timings.items():
+            baseline_seconds = baseline_timings.get(stage)
+
+            if baseline_seconds is None or baseline_seconds < min_seconds:
+                continue
+
+            if seconds > baseline_seconds * (1 + threshold):
+                messages.append(
+                    '{} {}: {:.3f} s, baseline {:.3f} s (+{:.0%})'.format(
+                        scenario, stage, seconds, baseline_seconds,
+                        seconds / baseline_seconds - 1))
+
+    return messages
+
+
+def format_results(results):
+    lines = ['{:<12}'.format('stage') + ''.join(
+        '{:>10}'.format(i) for i in sorted(results))]
+
+    for stage in stages + ['total']:
+        cells = []
+
+        for scenario in sorted(results):
+            timings = results[scenario]
+
+            if stage == 'total':
+                seconds = sum(timings.values())
+            else:
+                seconds = timings[stage]
+
+            cells.append('{:>10.3f}'.format(seconds))
+
+        lines.append('{:<12}'.format(stage) + ''.join(cells))
+
+    return '\n'.join(lines)
+
+
+def main(scenario, repeat, baseline, save, threshold):
+    if scenario is None:
+        selected_scenarios = scenarios
+    else:
+        selected_scenarios = [scenario]
+
+    results = {i: run_scenario(i, repeat) for i in selected_scenarios}
+
+    print(format_results(results))
+
+    if save is not None:
+        with open(save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4, sort_keys=True)
+            file.write('\n')
+
+    if baseline is not None:
+        with open(baseline, 'r', encoding='utf-8') as file:
+            messages = find_regressions(results, json.load(file), threshold)
+
+        for i in messages:
+            print('Regression: {}'.format(i))
+
+        if messages:
+            sys.exit(1)
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Measure the time generate_sources spends in each stage.')
+
+    parser.add_argument(
+        '--scenario',
+        choices=scenarios,
+        help='Only run the specified scenario instead of all.')
+
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Number of runs of each scenario. The median time is reported.')
+
+    parser.add_argument(
+        '--baseline',
+        help='Compare the timings to the ones saved using --save to the '
+             'specified file and fail if a stage became slower.')
+
+    parser.add_argument(
+        '--save',
+        help='Save the timings to the specified file.')
+
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=.25,
+        help='Fraction by which a stage may be slower than in the baseline '
+             'before it is considered a regression.')
+
+    return parser.parse_args()
+
+
+def script_main():
+    main(**vars(parse_args()))
@@ -0,0 +1,151 @@
+import json
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+from fillygons.benchmarks import find_regressions
+
+# Modules containing the main function of each console script, keyed by the
+# script's name.
+entry_points = {
+    'generate_sources': 'fillygons.generate_sources',
+    'render_stl': 'fillygons.testing.render_stl',
+    'check_test_cases': 'fillygons.testing.check_test_cases',
+    'benchmark_sources': 'fillygons.benchmarks',
+    'benchmark_startup': 'fillygons.benchmarks.startup'}
+
+# Key of the results in the file written using --save.
+scenario = 'startup'
+
+# Scripts faster than this in the baseline are not checked for regressions.
+min_checked_seconds = 0.02
+
+
+def parse_importtime(output):
+    """
+    Parse the output written by `python -X importtime` and return a list of
+    tuples (depth, module, cumulative_seconds) in the order in which the
+    imports finished, where depth is 0 for modules imported at the top
+    level, 1 for the modules imported by them and so on.
+    """
+    modules = []
+
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        _, cumulative, name = line.split('|')
+
+        # Skips the header.
+        if cumulative.strip().isdigit():
+            # Names are indented by 2 spaces per level.
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            modules.append((depth, name.strip(), int(cumulative) / 1e6))
+
+    return modules
+
+
+def measure_import(module):
+    """
+    Import the module in a new interpreter and return a tuple (seconds,
+    imports), where imports is a list of tuples (module, seconds) of the
+    modules directly imported by the module.
+    """
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True)
+
+    imports = []
+
+    # A module's imports are listed before the module itself.
+    for depth, name, seconds in parse_importtime(process.stderr):
+        if depth == 1:
+            imports.append((name, seconds))
+        elif depth == 0:
+            if name == module:
+                return seconds, imports
+
+            imports = []
+
+    raise Exception('Module not found in the output: {}'.format(module))
+
+
+def main(repeat, baseline, save, threshold, details):
+    timings = {}
+
+    for script, module in sorted(entry_points.items()):
+        runs = [measure_import(module) for _ in range(repeat)]
+        timings[script] = statistics.median(i for i, _ in runs)
+
+        print('{:<20}{:>10.3f}'.format(script, timings[script]))
+
+        if details:
+            _, imports = runs[-1]
+            imports = sorted(imports, key=lambda x: -x[1])
+
+            for name, seconds in imports[:details]:
+                print('    {:<36}{:>10.3f}'.format(name, seconds))
+
+    results = {scenario: timings}
+
+    if save is not None:
+        with open(save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4, sort_keys=True)
+            file.write('\n')
+
+    if baseline is not None:
+        with open(baseline, 'r', encoding='utf-8') as file:
+            messages = find_regressions(
+                results, json.load(file), threshold, min_checked_seconds)
+
+        for i in messages:
+            print('Regression: {}'.format(i))
+
+        if messages:
+            sys.exit(1)
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Measure the time needed to import the module of each '
+                    'console script using `python -X importtime`.')
+
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=5,
+        help='Number of imports of each module. The median time is '
+             'reported.')
+
+    parser.add_argument(
+        '--details',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Also list the N slowest modules imported directly by the '
+             'module of each script.')
+
+    parser.add_argument(
+        '--baseline',
+        help='Compare the timings to the ones saved using --save to the '
+             'specified file and fail if a script became slower.')
+
+    parser.add_argument(
+        '--save',
+        help='Save the timings to the specified file.')
+
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=.25,
+        help='Fraction by which a script may be slower than in the baseline '
+             'before it is considered a regression.')
+
+    return parser.parse_args()
+
+
+def script_main():
+    main(**vars(parse_args()))
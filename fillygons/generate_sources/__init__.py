@@ -1,26 +1,604 @@
-from argparse import ArgumentParser
+import contextlib
+import fnmatch
+import importlib
+import json
+import os
+import time
+from argparse import ArgumentParser, ArgumentTypeError
 
-from fillygons.generate_sources.variants import get_files
-from fillygons.generate_sources.utils import write_text_file
+from fillygons.generate_sources.variants import iter_files, iter_paths, \
+    metadata_path, catalog_path, add_used_path, split_files, \
+    iter_file_decisions, replay_file, variant_id, iter_shard_files, \
+    condition_attributes, iter_variant_ids
+from fillygons.generate_sources.catalog import CatalogWriter
+from fillygons.generate_sources.utils import write_text_file, \
+    makefile_fragment, JsonListWriter, Manifest, fillygon_placements, \
+    batch_content, default_settings, alias_matrix
+from fillygons.utils import profiling
+from fillygons.utils.toolchain import run_script
+from fillygons.utils.expressions import persistent_cache, load_cache, \
+    take_additions
 
+# Numerical values and LaTeX representations of expressions evaluated in an
+# earlier run.
+expression_cache_path = 'build/expression-cache.json'
 
-def main(list_files):
-    files = get_files()
+# Hashes of the files written by the last run, used to skip reading files
+# which did not change.
+manifest_path = 'src/.generated-manifest'
 
-    if list_files:
-        for i in files:
-            print(i.path)
+# Directory to which the files rendering batches of fillygons are written.
+batches_dir = 'build/batches'
+
+# Only fillygons with at most this many corners are compiled in batches. For
+# these, starting OpenSCAD takes a considerable part of the time needed to
+# compile them.
+batched_max_corners = 4
+
+# The decisions leading to each generated file, keyed by the file's ID.
+variant_index_path = 'build/variant-index.json'
+
+
+# Number of subtrees of the decisions per job when generating the files in
+# parallel. Using more subtrees than jobs evens out the differences in the
+# cost of individual polygons.
+subtrees_per_job = 4
+
+
+def iter_evaluated_files(with_metadata, with_batches, prefix=()):
+    """
+    Yield a tuple (path, content, metadata, canonical_form, placements, call)
+    for each generated file as soon as it is decided.
+
+    The metadata and, for fillygon files, the canonical form, see
+    fillygon_canonical_form(), are only computed if with_metadata is true and
+    are None otherwise. If with_batches is true, placements is as returned by
+    fillygon_placements() and call is the fillygon() call for the files
+    compiled in batches. Both are None for all other files.
+    """
+    for i in iter_files(prefix):
+        with profiling.family(i.family):
+            if with_metadata:
+                metadata = i.metadata
+                canonical_form = i.canonical_form
+            else:
+                metadata = None
+                canonical_form = None
+
+            if with_batches and _is_batched(i):
+                placements = fillygon_placements(i.arguments)
+                call = i.call
+            else:
+                placements = None
+                call = None
+
+            content = i.content
+
+        yield i.path, content, metadata, canonical_form, placements, call
+
+
+# Arguments to iter_evaluated_files() set in each worker process.
+_worker_arguments = None
+
+
+def _init_worker(with_metadata, with_batches, profile):
+    global _worker_arguments
+
+    _worker_arguments = with_metadata, with_batches
+    load_cache(expression_cache_path)
+
+    if profile:
+        importlib.import_module('fillygons.generate_sources.geometry')
+        profiling.enable_profile()
+
+
+def _evaluate_subtree(prefix):
+    # Runs in a worker process. Returns the evaluated files, the newly
+    # evaluated expressions and the profiled totals to the main process.
+    files = list(iter_evaluated_files(*_worker_arguments, prefix=prefix))
+
+    return files, take_additions(), profiling.take_families()
+
+
+def iter_evaluated_files_parallel(with_metadata, with_batches, jobs, cache):
+    """
+    Like iter_evaluated_files(), but split the decisions into subtrees which
+    are processed by jobs worker processes. The results are yielded in the
+    same order as by iter_evaluated_files().
+    """
+    # Imported here as importing multiprocessing takes a noticeable amount
+    # of time, which is wasted when running a single job.
+    from concurrent.futures import ProcessPoolExecutor
+
+    prefixes = split_files(jobs * subtrees_per_job)
+    profile = profiling.is_enabled()
+
+    with ProcessPoolExecutor(
+            jobs,
+            initializer=_init_worker,
+            initargs=(with_metadata, with_batches, profile)) as executor:
+        results = executor.map(_evaluate_subtree, prefixes)
+
+        for files, additions, families in results:
+            cache.merge(additions)
+
+            if families is not None:
+                profiling.merge_families(families)
+
+            yield from files
+
+
+def _is_batched(file):
+    # Whether the generated file is compiled as part of a batch, if batches
+    # are written. Only depends on the path and number of corners of the
+    # file, so that the batches can be listed without evaluating anything.
+    return file.num_corners is not None \
+        and file.num_corners <= batched_max_corners
+
+
+class _BatchWriter:
+    """
+    Collects the fillygons to be compiled in batches and writes a file for
+    each batch of batch_size fillygons, see batch_content().
+
+    If write is false, the batches are only recorded in batches, which are
+    tuples (batch_path, paths).
+    """
+
+    def __init__(self, batch_size, write=True):
+        self.batch_size = batch_size
+        self.batches = []
+        self._write = write
+        self._parts = []
+
+    def add(self, path, call=None, placements=None):
+        self._parts.append((path, call, placements))
+
+        if len(self._parts) == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # A batch with a single fillygon would not save anything.
+        if len(self._parts) > 1:
+            batch_path = os.path.join(
+                batches_dir, '{}.scad'.format(len(self.batches) + 1))
+
+            if self._write:
+                content, layout = batch_content(
+                    batch_path,
+                    self._parts,
+                    default_settings()['side_length_unit'] / 2)
+
+                write_text_file(batch_path, content)
+                write_text_file(
+                    os.path.splitext(batch_path)[0] + '.json',
+                    json.dumps(layout, indent=4, sort_keys=True) + '\n')
+
+            self.batches.append(
+                (batch_path, [path for path, _, _ in self._parts]))
+
+        self._parts = []
+
+
+def write_files(jobs, with_metadata, batch_size=None):
+    """
+    Write each generated file as soon as it is decided and append its
+    metadata to the metadata file, without keeping any of them in memory.
+
+    The metadata is also written to the catalog at catalog_path. If
+    with_metadata is false, both are left untouched, which saves evaluating
+    the formulae in the metadata.
+
+    If batch_size is given, additionally files rendering batches of that
+    many of the fillygons with few corners are written to batches_dir. The
+    rules written by write_makefile() compile these instead of the
+    individual files.
+
+    Of the fillygon files with the same canonical form, see
+    fillygon_canonical_form(), only the first is compiled. The metadata of
+    the others gets the entries alias_of, the path of that file, and
+    alias_matrix, the transformation mapping its part onto theirs, so that
+    their STL files can be derived from its STL file. Files compiled as part
+    of a batch are still rendered with their batch.
+
+    The geometry of each polygon is checked when the first of its files is
+    evaluated, see Polygon.checked_geometry.
+    """
+    used_paths = set()
+
+    # Tuples (path, matrix) of the first file with each canonical form, keyed
+    # by its key.
+    canonical_files = {}
+    manifest = Manifest(manifest_path)
+    previous_entries = manifest.previous_entries
+
+    batch_writer = _BatchWriter(batch_size)
+
+    with persistent_cache(expression_cache_path) as cache, \
+            contextlib.ExitStack() as exit_stack:
+        if with_metadata:
+            metadata_writer = exit_stack.enter_context(
+                JsonListWriter(metadata_path))
+
+            catalog_writer = exit_stack.enter_context(
+                CatalogWriter(catalog_path))
+
+        if jobs > 1:
+            files = iter_evaluated_files_parallel(
+                with_metadata, batch_size is not None, jobs, cache)
+        else:
+            files = iter_evaluated_files(with_metadata, batch_size is not None)
+
+        for path, content, metadata, canonical_form, placements, call \
+                in files:
+            add_used_path(used_paths, path)
+
+            if canonical_form is not None:
+                key, matrix = canonical_form
+                canonical_path, canonical_matrix = \
+                    canonical_files.setdefault(key, (path, matrix))
+
+                if canonical_path != path:
+                    metadata = dict(
+                        metadata,
+                        alias_of=canonical_path,
+                        alias_matrix=alias_matrix(matrix, canonical_matrix))
+
+            if call is not None:
+                batch_writer.add(path, call, placements)
+
+            entry = write_text_file(path, content, previous_entries.get(path))
+            manifest.set(path, entry)
+
+            if metadata is not None:
+                metadata_writer.append(metadata)
+                catalog_writer.append(metadata)
+
+    batch_writer.flush()
+    manifest.save()
+
+    for i in manifest.stale_paths():
+        print('Warning: Stale generated file: {}'.format(i))
+
+
+def write_makefile(path, shard, conditions, batch_size):
+    """
+    Write the makefile fragment listing the generated files and the batches
+    written by write_files(), see makefile_fragment(). Both are enumerated
+    without evaluating any expressions.
+
+    Batches are only listed when listing all files, as they are only
+    written when writing all files.
+    """
+    batch_writer = _BatchWriter(batch_size, write=False)
+
+    if batch_size is not None and shard is None and conditions is None:
+        for i in iter_files():
+            if _is_batched(i):
+                batch_writer.add(i.path)
+
+        batch_writer.flush()
+
+    # Always written, even if unchanged, so that make sees it as being
+    # up-to-date.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(makefile_fragment(
+            list(iter_paths(shard, conditions)), batch_writer.batches))
+
+
+def write_variant_index():
+    """
+    Write the index of the decisions leading to each generated file and
+    return it.
+    """
+    index = {i: list(decisions) for i, decisions in iter_file_decisions()}
+
+    os.makedirs(os.path.dirname(variant_index_path), exist_ok=True)
+
+    with open(variant_index_path, 'w', encoding='utf-8') as file:
+        json.dump(index, file, sort_keys=True)
+
+    return index
+
+
+def write_single_files(variant_ids):
+    """
+    Write only the generated files with the specified IDs, replaying their
+    decisions from the index. The index is rebuilt if it is missing or out
+    of date.
+    """
+    if os.path.exists(variant_index_path):
+        with open(variant_index_path, 'r', encoding='utf-8') as file:
+            index = json.load(file)
+    else:
+        index = write_variant_index()
+
+    manifest = Manifest(manifest_path)
+
+    with persistent_cache(expression_cache_path):
+        for i in variant_ids:
+            decisions = index.get(i)
+
+            try:
+                file = replay_file(decisions) if decisions else None
+            except ValueError:
+                file = None
+
+            # The index is out of date if the decisions do not lead to the
+            # file with the same ID anymore. The IDs have been checked by
+            # parse_args(), so the rebuilt index contains them.
+            if file is None or variant_id(file.path) != i:
+                index = write_variant_index()
+                file = replay_file(index[i])
+
+            entry = write_text_file(
+                file.path, file.content, manifest.get(file.path))
+
+            manifest.set(file.path, entry)
+
+    manifest.save()
+
+
+def write_selected_files(shard, conditions):
+    """
+    Write only the generated files of the specified slice, as returned by
+    iter_shard_files(), or the files satisfying the conditions. The metadata
+    file is left untouched, as it contains the metadata of all files.
+    """
+    used_paths = set()
+    manifest = Manifest(manifest_path)
+
+    if shard is None:
+        files = iter_files(conditions=conditions)
     else:
+        files = iter_shard_files(*shard, conditions=conditions)
+
+    with persistent_cache(expression_cache_path):
         for i in files:
-            write_text_file(i.path, i.content)
+            add_used_path(used_paths, i.path)
+
+            entry = write_text_file(i.path, i.content, manifest.get(i.path))
+            manifest.set(i.path, entry)
+
+    manifest.save()
+
+
+def _equals_pattern(value, pattern):
+    # Numbers are compared numerically, so that e.g. gap=0.20 matches a gap
+    # of 0.2.
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return value == float(pattern)
+        except ValueError:
+            return False
+
+    return str(value) == pattern
+
+
+def make_conditions(where):
+    """
+    Return the conditions for iter_files() described by a list of tuples
+    (attribute, operator, pattern), as returned by parse_where(). All
+    conditions on the same attribute must be satisfied.
+    """
+    if not where:
+        return None
+
+    conditions = {}
+
+    for attribute, operator, pattern in where:
+        if operator == '=':
+            def condition(value, pattern=pattern):
+                return _equals_pattern(value, pattern)
+        else:
+            def condition(value, pattern=pattern):
+                return fnmatch.fnmatchcase(str(value), pattern)
+
+        previous = conditions.get(attribute)
+
+        if previous is not None:
+            def condition(value, first=previous, second=condition):
+                return first(value) and second(value)
+
+        conditions[attribute] = condition
+
+    return conditions
+
+
+def write_profile(path, profile, seconds, import_seconds):
+    """
+    Write the totals recorded by the profile for each family of polygons
+    together with the total run time and the time spent importing sympy to a
+    JSON file.
+    """
+    data = dict(
+        seconds=seconds,
+        import_seconds=import_seconds,
+        families=profile.families)
+
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=4, sort_keys=True)
+        file.write('\n')
+
+
+def main(
+        list_files, makefile, jobs, no_formulae, variants, shard, where,
+        batch_size, profile, profile_stats):
+    with contextlib.ExitStack() as exit_stack:
+        if profile is not None:
+            active_profile = exit_stack.enter_context(
+                profiling.active_profile())
+
+            start = time.perf_counter()
+
+            # Imported up front so that importing sympy is not attributed to
+            # the first family.
+            importlib.import_module('fillygons.generate_sources.geometry')
+            import_seconds = time.perf_counter() - start
+
+        if profile_stats is not None:
+            import cProfile
+
+            stats_profile = cProfile.Profile()
+            stats_profile.enable()
+
+        generate(
+            list_files, makefile, jobs, no_formulae, variants, shard, where,
+            batch_size)
+
+        if profile_stats is not None:
+            stats_profile.disable()
+            stats_profile.dump_stats(profile_stats)
+
+        if profile is not None:
+            write_profile(
+                profile,
+                active_profile,
+                time.perf_counter() - start,
+                import_seconds)
+
+
+def generate(
+        list_files, makefile, jobs, no_formulae, variants, shard, where,
+        batch_size):
+    conditions = make_conditions(where)
+
+    # Only the paths are needed to list the files, which can be computed
+    # without evaluating any expressions.
+    if list_files:
+        for i in iter_paths(shard, conditions):
+            print(i)
+    elif makefile is not None:
+        write_makefile(makefile, shard, conditions, batch_size)
+    elif variants:
+        write_single_files(variants)
+    elif shard is not None or conditions is not None:
+        write_selected_files(shard, conditions)
+    else:
+        write_files(jobs, not no_formulae, batch_size)
+
+
+def parse_shard(value):
+    index, slash, count = value.partition('/')
+
+    try:
+        index = int(index)
+        count = int(count)
+    except ValueError:
+        raise ArgumentTypeError('Expected I/N, got: {}'.format(value))
+
+    if not slash or not 1 <= index <= count:
+        raise ArgumentTypeError('Expected I/N, got: {}'.format(value))
+
+    return index, count
+
+
+def parse_where(value):
+    for operator in '=~':
+        attribute, found, pattern = value.partition(operator)
+
+        if found and attribute in condition_attributes:
+            return attribute, operator, pattern
+
+    raise ArgumentTypeError(
+        'Expected ATTRIBUTE=VALUE or ATTRIBUTE~PATTERN with one of the '
+        'attributes {}, got: {}'.format(
+            ', '.join(condition_attributes), value))
 
 
 def parse_args():
     parser = ArgumentParser()
     parser.add_argument('--list-files', action='store_true')
 
-    return parser.parse_args()
+    parser.add_argument(
+        '--makefile',
+        help='Instead of generating the files, write a makefile fragment '
+             'listing them to the specified path.')
 
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        help='Number of processes used to generate the files.')
 
-def script_main():
+    parser.add_argument(
+        '--no-formulae',
+        action='store_true',
+        help='Only write the OpenSCAD files and leave {} and {} untouched, '
+             'which skips evaluating the formulae describing each '
+             'variant.'.format(metadata_path, catalog_path))
+
+    parser.add_argument(
+        '--variant',
+        action='append',
+        dest='variants',
+        help='Only write the file with the specified ID, e.g. '
+             '0.2mm/rhombus-63/filled, and leave all other files untouched. '
+             'Can be specified multiple times.')
+
+    parser.add_argument(
+        '--shard',
+        type=parse_shard,
+        help='Only write the I-th of N slices of the generated files with '
+             'about the same number of files each, e.g. 3/8, and leave {} '
+             'and {} untouched. Also applies to --list-files and '
+             '--makefile.'.format(metadata_path, catalog_path))
+
+    parser.add_argument(
+        '--where',
+        type=parse_where,
+        action='append',
+        help='Only write the fillygons whose attribute is equal to VALUE or '
+             'matches the glob PATTERN, e.g. gap=0.2, variant=normal or '
+             '\'name~rhombus-*\', and leave {} and {} untouched. Attributes '
+             'are {}. Can be specified multiple times. Also applies to '
+             '--list-files, --makefile and --shard.'.format(
+                metadata_path, catalog_path,
+                ', '.join(condition_attributes)))
+
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        help='Also write files to {} which each render this many fillygons '
+             'with at most {} corners, so that they can be compiled by a '
+             'single run of OpenSCAD. Also applies to --makefile, which '
+             'then lists the batches.'.format(
+                batches_dir, batched_max_corners))
+
+    parser.add_argument(
+        '--profile',
+        help='Write the time spent generating the files of each family of '
+             'polygons, the part of it spent in sympy and the allocated '
+             'memory blocks to the specified JSON file.')
+
+    parser.add_argument(
+        '--profile-stats',
+        help='Write cProfile statistics of the main process to the '
+             'specified file, which can be read using the pstats module.')
+
+    args = parser.parse_args()
+
+    if (args.shard is not None or args.where) and args.jobs > 1:
+        parser.error('--shard and --where cannot be combined with --jobs.')
+
+    if args.variants:
+        # Enumerating the IDs is cheap compared to rebuilding the index of
+        # the decisions, which write_single_files() does for unknown IDs.
+        unknown_ids = set(args.variants) - set(iter_variant_ids())
+
+        if unknown_ids:
+            parser.error('Unknown variant: {}'.format(
+                ', '.join(sorted(unknown_ids))))
+
+    return args
+
+
+def run():
     main(**vars(parse_args()))
+
+
+def script_main():
+    run_script(__name__, run)
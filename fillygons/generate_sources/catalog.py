@@ -0,0 +1,274 @@
+import filecmp
+import json
+import os
+import sqlite3
+
+_schema = '''
+create table polygons (
+    id integer primary key,
+    name text not null,
+    regular integer not null,
+    rhombus integer not null,
+    side_repetitions integer not null,
+    short_diagonal_value real not null,
+    short_diagonal_formula text not null,
+    long_diagonal_value real not null,
+    long_diagonal_formula text not null,
+    diagonal_ratio_value real not null,
+    diagonal_ratio_formula text not null);
+
+create table variants (
+    id integer primary key,
+    path text not null unique,
+    polygon integer not null,
+    gap real not null,
+    filled integer not null,
+    filled_corners integer not null,
+    min_convex_angle real not null,
+    min_concave_angle real not null,
+    alias_of text,
+    alias_matrix text);
+
+create table edges (
+    value real not null,
+    polygon integer not null,
+    position integer not null,
+    formula text not null,
+    reversed integer,
+    primary key (value, polygon, position)) without rowid;
+
+create table angles (
+    value real not null,
+    polygon integer not null,
+    position integer not null,
+    formula text not null,
+    primary key (value, polygon, position)) without rowid;
+'''
+
+# Created after inserting all rows, which is faster than updating them with
+# each row. The tables edges and angles are already ordered by value.
+_indexes = '''
+create index polygons_name on polygons (name);
+create index variants_polygon on variants (polygon);
+create index variants_gap on variants (gap);
+'''
+
+# Columns of the tables polygons and variants, which are named like the
+# corresponding entries of the metadata.
+_polygon_columns = [
+    'name', 'regular', 'rhombus', 'side_repetitions',
+    'short_diagonal_value', 'short_diagonal_formula',
+    'long_diagonal_value', 'long_diagonal_formula',
+    'diagonal_ratio_value', 'diagonal_ratio_formula']
+
+_variant_columns = [
+    'path', 'gap', 'filled', 'filled_corners', 'min_convex_angle',
+    'min_concave_angle']
+
+_boolean_columns = {'regular', 'rhombus', 'filled', 'filled_corners'}
+
+# Columns of the table variants which are only set for variants whose
+# metadata has the corresponding entry. alias_matrix is stored as JSON.
+_alias_columns = ['alias_of', 'alias_matrix']
+
+
+class CatalogWriter:
+    """
+    Write the metadata of the generated variants to an SQLite database one
+    variant at a time, as a compact alternative to the JSON file which can
+    be queried without reading all of it.
+
+    The metadata shared by all variants of a polygon is stored once in the
+    table `polygons`, the table `variants` contains the remaining entries
+    of each variant together with the ID of its polygon. The tables `edges`
+    and `angles` contain the value, in radians, and the formula of each
+    edge and angle of each polygon together with its position, and are
+    ordered by value. The name of the polygons and the gap of the variants
+    are indexed, see find_variants(). The columns alias_of and alias_matrix
+    are null unless the variant is an alias of another, see write_files().
+
+    Like JsonListWriter, the database is written to a temporary file, which
+    only replaces the existing file if their content differs.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._temp_path = path + '~'
+        self._connection = None
+        self._variant_id = 0
+
+        # IDs of the polygons written so far, keyed by their metadata.
+        self._polygon_ids = {}
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+
+        if os.path.exists(self._temp_path):
+            os.unlink(self._temp_path)
+
+        self._connection = sqlite3.connect(self._temp_path)
+        self._connection.executescript(_schema)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._connection.executescript(_indexes)
+            self._connection.commit()
+
+        self._connection.close()
+
+        if exc_type is not None:
+            os.unlink(self._temp_path)
+        elif os.path.exists(self._path) \
+                and filecmp.cmp(self._temp_path, self._path, shallow=False):
+            os.unlink(self._temp_path)
+        else:
+            os.replace(self._temp_path, self._path)
+
+    def _polygon_id(self, metadata):
+        edges = list(zip(
+            metadata['edges_values'],
+            metadata['edges_formulae'],
+            metadata['reversed_edges']
+            or [None] * len(metadata['edges_values'])))
+
+        angles = list(zip(
+            metadata['angles_values'], metadata['angles_formulae']))
+
+        row = tuple(metadata[i] for i in _polygon_columns)
+        key = row, tuple(edges), tuple(angles)
+        polygon_id = self._polygon_ids.get(key)
+
+        if polygon_id is None:
+            polygon_id = self._polygon_ids[key] = len(self._polygon_ids) + 1
+
+            self._connection.execute(
+                'insert into polygons values ({})'.format(
+                    ', '.join('?' * (len(row) + 1))),
+                (polygon_id,) + row)
+
+            self._connection.executemany(
+                'insert into edges values (?, ?, ?, ?, ?)',
+                (
+                    (v, polygon_id, i, f, r)
+                    for i, (v, f, r) in enumerate(edges)))
+
+            self._connection.executemany(
+                'insert into angles values (?, ?, ?, ?)',
+                ((v, polygon_id, i, f) for i, (v, f) in enumerate(angles)))
+
+        return polygon_id
+
+    def append(self, metadata):
+        self._variant_id += 1
+        polygon_id = self._polygon_id(metadata)
+
+        alias_matrix = metadata.get('alias_matrix')
+
+        if alias_matrix is not None:
+            alias_matrix = json.dumps(alias_matrix)
+
+        columns = _variant_columns + _alias_columns
+
+        self._connection.execute(
+            'insert into variants ({}) values ({})'.format(
+                ', '.join(['id', 'polygon'] + columns),
+                ', '.join('?' * (len(columns) + 2))),
+            [self._variant_id, polygon_id]
+            + [metadata[i] for i in _variant_columns]
+            + [metadata.get('alias_of'), alias_matrix])
+
+
+def _read_metadata(connection, query, parameters):
+    # Returns the metadata of the variants selected by the query, which
+    # selects the ID of the polygon, the alias columns and the remaining
+    # columns of the joined tables `variants` and `polygons`.
+    metadata_list = []
+    polygon_ids = []
+
+    for row in connection.execute(query, parameters):
+        polygon_id, alias_of, alias_matrix, *values = row
+        metadata = dict(zip(_variant_columns + _polygon_columns, values))
+
+        for i in _boolean_columns:
+            metadata[i] = bool(metadata[i])
+
+        if alias_of is not None:
+            metadata['alias_of'] = alias_of
+            metadata['alias_matrix'] = json.loads(alias_matrix)
+
+        metadata_list.append(metadata)
+        polygon_ids.append(polygon_id)
+
+    # Lists of the edges and angles of each polygon, keyed by its ID.
+    edges = {}
+    angles = {}
+
+    for polygon_id in set(polygon_ids):
+        edges[polygon_id] = connection.execute(
+            'select value, formula, reversed from edges where polygon = ? '
+            'order by position', [polygon_id]).fetchall()
+
+        angles[polygon_id] = connection.execute(
+            'select value, formula from angles where polygon = ? '
+            'order by position', [polygon_id]).fetchall()
+
+    for metadata, polygon_id in zip(metadata_list, polygon_ids):
+        metadata['edges_values'] = [v for v, _, _ in edges[polygon_id]]
+        metadata['edges_formulae'] = [f for _, f, _ in edges[polygon_id]]
+        metadata['angles_values'] = [v for v, _ in angles[polygon_id]]
+        metadata['angles_formulae'] = [f for _, f in angles[polygon_id]]
+
+        metadata['reversed_edges'] = [
+            bool(r) for _, _, r in edges[polygon_id] if r is not None]
+
+    return metadata_list
+
+
+def find_variants(
+        catalog_path, name=None, gap=None, edge=None, angle=None,
+        tolerance=1e-6):
+    """
+    Return the metadata of the variants in the catalog written by
+    CatalogWriter, which have the specified name and gap and have an edge
+    and an angle, in radians, with the specified values. Arguments which are
+    None are ignored. Numbers are compared using the specified tolerance.
+
+    Each of the criteria is looked up using an index, so that only the
+    matching variants are read. The metadata is the same as written to the
+    JSON file.
+    """
+    conditions = []
+    parameters = []
+
+    if name is not None:
+        conditions.append('polygons.name = ?')
+        parameters.append(name)
+
+    if gap is not None:
+        conditions.append('variants.gap between ? and ?')
+        parameters.extend([gap - tolerance, gap + tolerance])
+
+    for table, value in [('edges', edge), ('angles', angle)]:
+        if value is not None:
+            conditions.append(
+                'polygons.id in (select polygon from {} '
+                'where value between ? and ?)'.format(table))
+            parameters.extend([value - tolerance, value + tolerance])
+
+    query = 'select polygons.id, {} from variants join polygons ' \
+        'on variants.polygon = polygons.id'.format(', '.join(
+            ['variants.' + i for i in _alias_columns + _variant_columns]
+            + ['polygons.' + i for i in _polygon_columns]))
+
+    if conditions:
+        query += ' where ' + ' and '.join(conditions)
+
+    connection = sqlite3.connect(catalog_path)
+
+    try:
+        return _read_metadata(
+            connection, query + ' order by variants.path', parameters)
+    finally:
+        connection.close()
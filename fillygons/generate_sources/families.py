@@ -0,0 +1,292 @@
+"""
+Registry of the families of polygons of which fillygons are generated.
+
+Each family lists the parameters of its polygons together with their names,
+which is all that is needed to enumerate the generated files. The geometry
+of a polygon is computed by the function in `geometry.py` named like its
+family, which is only imported and called once the geometry is needed.
+"""
+
+from fillygons.utils.profiling import sympy_time
+
+
+def load_geometry():
+    # Imported lazily, as importing sympy takes a considerable amount of time
+    # which is wasted when e.g. only listing the generated files.
+    from fillygons.generate_sources import geometry
+
+    return geometry
+
+
+class Polygon:
+    """
+    The shape of a fillygon, which is shared by all its variants.
+
+    The geometry of the polygon is computed by its family, which is only
+    done when the geometry is first accessed. num_corners is declared
+    separately, so that it is known without computing the geometry.
+
+    checked_geometry is the same as geometry, but additionally checks the
+    geometry when it is first accessed, see validate_polygon().
+    """
+
+    def __init__(self, family, name, polygon_name, num_corners,
+            parameters=(), regular=False, rhombus=False, side_repetitions=1,
+            reversed_edges=()):
+        self.family = family.name
+        self.name = name
+        self.polygon_name = polygon_name
+        self.num_corners = num_corners
+        self.regular = regular
+        self.rhombus = rhombus
+        self.side_repetitions = side_repetitions
+        self.reversed_edges = list(reversed_edges)
+        self.parameters = list(parameters)
+        self._family = family
+        self._geometry = None
+        self._checked = False
+
+    @property
+    def geometry(self):
+        if self._geometry is None:
+            with sympy_time():
+                self._geometry = self._family.geometry(*self.parameters)
+
+        return self._geometry
+
+    @property
+    def checked_geometry(self):
+        if not self._checked:
+            # Imported here so that numpy is not imported when e.g. only
+            # listing the generated files.
+            from fillygons.generate_sources.validation import \
+                validate_polygon
+
+            validate_polygon(self)
+            self._checked = True
+
+        return self.geometry
+
+
+class PolygonFamily:
+    """
+    A family of polygons whose geometry is computed by the same function.
+
+    rows is a list of dicts with the arguments passed to Polygon for each
+    polygon of the family, in the order in which they are generated.
+    """
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.polygons = [Polygon(self, **i) for i in rows]
+
+    def geometry(self, *parameters):
+        return getattr(load_geometry(), self.name)(*parameters)
+
+
+def _named(names, **kwargs):
+    # Rows for polygons which are identified by their name, given as tuples
+    # (name, polygon_name, num_corners).
+    return [
+        dict(
+            name=name, polygon_name=polygon_name, num_corners=num_corners,
+            parameters=[polygon_name], **kwargs)
+        for name, polygon_name, num_corners in names]
+
+
+def _rectangles():
+    return _named([
+        ('Rectangle (1, sqrt2)', 'rectangle-1-sqrt2', 4),
+        ('Rectangle (1, Phi)', 'rectangle-1-phi', 4),
+        ('Rectangle (1, 2)', 'rectangle-1-2', 4),
+        #('Rectangle (1, double)', 'rectangle-1-double', 4),
+
+        ('Rectangle (sqrt2, Phi)', 'rectangle-sqrt2-phi', 4),
+        ('Rectangle (sqrt2, 2)', 'rectangle-sqrt2-2', 4),
+        ('Rectangle (sqrt2, double)', 'rectangle-sqrt2-double', 6),
+
+        ('Rectangle (Phi, 2)', 'rectangle-phi-2', 4),
+        ('Rectangle (Phi, double)', 'rectangle-phi-double', 6),
+
+        ('Rectangle (2, double)', 'rectangle-2-double', 6)])
+
+
+def _triangles():
+    return _named([
+        ('Right isosceles triangle', 'right-isosceles-triangle', 3),
+        ('Right isosceles triangle (sqrt2)', 'right-isosceles-triangle-sqrt2', 3),
+        ('Right isosceles triangle (sqrt2, double)', 'right-isosceles-triangle-sqrt2-double', 4),
+
+        ('Isosceles triangle (1, sqrt2, sqrt2)', 'isosceles-triangle-1-sqrt2-sqrt2', 3),
+        ('Isosceles triangle (sqrt2, 2, 2)', 'isosceles-triangle-sqrt2-2-2', 3),
+        ('Isosceles triangle (sqrt2, double, double)', 'isosceles-triangle-sqrt2-double-double', 5),
+
+        ('Isosceles triangle (1, Phi, Phi)', 'isosceles-triangle-1-phi-phi', 3),
+
+        ('Isosceles triangle (1, 2, 2)', 'isosceles-triangle-1-2-2', 3),
+        ('Isosceles triangle (1, double, double)', 'isosceles-triangle-1-double-double', 5)])
+
+
+def _concave_dodecahedron_halffaces():
+    return [
+        dict(
+            name='Concave dodecahedron halfface ({})'.format(enantiomorph),
+            polygon_name='concave-dodecahedron-halfface-{}'.format(
+                enantiomorph),
+            num_corners=4,
+            parameters=[enantiomorph])
+        for enantiomorph in ['laevo', 'dextro']]
+
+
+def _single(name, polygon_name, num_corners):
+    # Rows for families consisting of a single polygon without parameters.
+    return [
+        dict(name=name, polygon_name=polygon_name, num_corners=num_corners)]
+
+
+def _disdyakis_triangles():
+    return _named([
+        ('Disdyakis dodecahedron', 'disdyakis-dodecahedron', 3),
+        ('Disdyakis triacontahedron', 'disdyakis-triacontahedron', 3)])
+
+
+def _kis_triangles():
+    return _named([
+        ('Triakis tetrahedron', 'triakis-tetrahedron', 3),
+        ('Triakis octahedron', 'triakis-octahedron', 3),
+        ('Triakis icosahedron', 'triakis-icosahedron', 3),
+        ('Tetrakis hexahedron', 'tetrakis-hexahedron', 3),
+        ('Pentakis dodecahedron', 'pentakis-dodecahedron', 3)])
+
+
+def _special_scale_polygons():
+    # Special scales for specific constructions.
+    return _named(
+        [
+            # Truncated hexahedron with diagonal trigonal tunnels
+            ('4-Gon (0.7812)', '4-gon-0.7812', 4),
+
+            # Initial version of fillygon above, result of wrong math.
+            ('4-Gon (0.8906)', '4-gon-0.8906', 4)],
+        regular=True,
+        rhombus=True)
+
+
+def _scaled_regular_polygons():
+    # Generic scales of edge lengths.
+    return [
+        dict(
+            name='{}-Gon ({})'.format(num_sides, scale_desc),
+            polygon_name='{}-gon-{}'.format(num_sides, scale_desc.lower()),
+            num_corners=num_sides,
+            parameters=[num_sides, scale_desc],
+            regular=True,
+            rhombus=num_sides == 4)
+        for scale_desc in ['sqrt2', 'Phi', '2']
+        for num_sides in [3, 4, 5, 6]]
+
+
+def _special_tiles():
+    return _named([('Rectangle', 'rectangle', 6), ('Triamond', 'triamond', 5)])
+
+
+def _flat_hexagons():
+    # Flat hexagons, named by the angle of their two opposite corners in
+    # degrees. See geometry.flat_hexagon().
+    return [
+        dict(
+            name='6-Gon {}'.format(degrees_rounded),
+            polygon_name='6-gon-flat-{}'.format(degrees_rounded),
+            num_corners=6,
+            parameters=[degrees_rounded])
+        for degrees_rounded in [117, 90, 109, 63, 71]]
+
+
+def _rhombi():
+    # Rhombi, named by their acute angle in degrees. See geometry.rhombus()
+    # for their diagonals.
+    return [
+        dict(
+            name='Rhombus ({})'.format(degrees_rounded),
+            polygon_name='rhombus-{}'.format(degrees_rounded),
+            num_corners=4,
+            parameters=[degrees_rounded],
+            rhombus=True)
+        for degrees_rounded in [60, 71, 63, 42, 76, 78, 57, 48]]
+
+
+def _regular_polygons():
+    rows = []
+
+    # n-gons with reversed sides.
+    for num_sides, *reversed_edges in [
+            (3, True),
+            (4, True),
+            (4, True, True),
+            (4, True, False, True),
+            (5, True),
+            (5, True, True),
+            (5, True, False, True)]:
+        reversed_edges += [False] * (num_sides - len(reversed_edges))
+
+        rows.append(dict(
+            name='{}-Gon'.format(num_sides),
+            polygon_name='{}-gon-reversed-{}'.format(
+                num_sides, ''.join('.r'[i] for i in reversed_edges)),
+            num_corners=num_sides,
+            parameters=[num_sides, 1],
+            regular=True,
+            rhombus=num_sides == 4,
+            reversed_edges=reversed_edges))
+
+    for num_sides in range(3, 12 + 1):
+        for side_repetitions in [1, 2] if num_sides <= 6 else [1]:
+            name = '{}-Gon'.format(num_sides)
+            polygon_name = '{}-gon'.format(num_sides)
+
+            if side_repetitions > 1:
+                polygon_name += '-double'
+                name += ' (double)'
+
+            rows.append(dict(
+                name=name,
+                polygon_name=polygon_name,
+                num_corners=num_sides * side_repetitions,
+                parameters=[num_sides, side_repetitions],
+                regular=True,
+                rhombus=num_sides == 4,
+                side_repetitions=side_repetitions))
+
+    return rows
+
+
+# All families in the order in which their fillygons are generated.
+polygon_families = [
+    PolygonFamily('rectangle', _rectangles()),
+    PolygonFamily('triangle', _triangles()),
+    PolygonFamily(
+        'concave_dodecahedron_halfface', _concave_dodecahedron_halffaces()),
+    PolygonFamily(
+        'pentagonal_hexecontahedron',
+        _single(
+            'Pentagonal hexecontahedron', 'pentagonal-hexecontahedron', 5)),
+    PolygonFamily(
+        'pentagonal_icositetrahedron',
+        _single(
+            'Pentagonal icositetrahedron', 'pentagonal-icositetrahedron', 5)),
+    PolygonFamily(
+        'deltoidal_hexecontahedron',
+        _single(
+            'Deltoidal hexecontahedron', 'deltoidal-hexecontahedron', 4)),
+    PolygonFamily(
+        'deltoidal_icositetrahedron',
+        _single(
+            'Deltoidal icositetrahedron', 'deltoidal-icositetrahedron', 4)),
+    PolygonFamily('disdyakis_triangle', _disdyakis_triangles()),
+    PolygonFamily('kis_triangle', _kis_triangles()),
+    PolygonFamily('special_scale_polygon', _special_scale_polygons()),
+    PolygonFamily('scaled_regular_polygon', _scaled_regular_polygons()),
+    PolygonFamily('special_tile', _special_tiles()),
+    PolygonFamily('flat_hexagon', _flat_hexagons()),
+    PolygonFamily('rhombus', _rhombi()),
+    PolygonFamily('regular_polygon', _regular_polygons())]
@@ -0,0 +1,294 @@
+"""
+Formulas for the shapes of all fillygons.
+
+This is kept separate from the decisions in `variants.py` so that sympy
+only needs to be imported once the geometry of a polygon is actually needed
+and not e.g. when only listing the paths of the generated files.
+"""
+
+import math
+
+from sympy import Rational, GoldenRatio, TribonacciConstant, acos, atan, sqrt, \
+    cbrt, pi, rad, deg, S
+
+from fillygons.utils.expressions import evaluate_float
+
+
+class Geometry:
+    """
+    The angles and edge lengths of a polygon, as sympy expressions.
+    """
+
+    def __init__(self, angles, edges, short_diagonal=0, long_diagonal=1):
+        self.angles = angles
+        self.edges = edges
+        self.short_diagonal = short_diagonal
+        self.long_diagonal = long_diagonal
+        self.diagonal_ratio = short_diagonal / long_diagonal
+
+
+def _equilateral(angles, short_diagonal=0, long_diagonal=1):
+    # Compute the last angle
+    angles = [(len(angles) - 1) * pi - sum(angles)] + angles
+
+    # Constant edge length for all equilateral polygons
+    edges = len(angles) * [1]
+
+    return Geometry(angles, edges, short_diagonal, long_diagonal)
+
+
+def _check_degrees(angle, degrees):
+    # The rounded angle is part of the polygon's name, which is decided
+    # without evaluating the angle.
+    assert round(evaluate_float(deg(angle))) == degrees, \
+        'Angle does not match the name of the polygon: {}'.format(degrees)
+
+
+def regular_polygon(num_sides, side_repetitions):
+    directions = [
+        2 * pi / num_sides * i
+        for i in range(num_sides)
+        for _ in range(side_repetitions)]
+
+    angles = [pi - b + a for a, b in zip(directions, directions[1:])]
+
+    if num_sides == 4:
+        diagonal = side_repetitions * sqrt(2)
+
+        return _equilateral(angles, diagonal, diagonal)
+    else:
+        return _equilateral(angles)
+
+
+# Ratios of the diagonals of all rhombi, keyed by their acute angle rounded
+# to degrees.
+_rhombus_diagonal_ratios = {
+    # Diamond
+    60: (1, sqrt(3)),
+    # Rhombic Dodecahedron
+    71: (1, sqrt(2)),
+    # Rhombic Triacontahedron
+    63: (1, GoldenRatio),
+    # Rhombic Enneacontahedron
+    42: (1, GoldenRatio ** 2),
+
+    # Spiral Tube n = 4 and m = 1
+    76: (sqrt(3), sqrt(5)),
+
+    # Polar Zonohedron n = 5
+    78: (sqrt(7 - sqrt(5)), sqrt(5 + sqrt(5))),
+    57: (sqrt(5 - sqrt(5)), sqrt(7 + sqrt(5))),
+    # Polar Zonohedron n = 6
+    48: (1, sqrt(5))}
+
+
+def rhombus(degrees):
+    diagonal_ratio_num, diagonal_ratio_denom = \
+        _rhombus_diagonal_ratios[degrees]
+
+    assert diagonal_ratio_num < diagonal_ratio_denom
+
+    acute_angle = 2 * atan(S(diagonal_ratio_num) / diagonal_ratio_denom)
+    short_diagonal = 2 * diagonal_ratio_num / sqrt(diagonal_ratio_num**2 + diagonal_ratio_denom**2)
+    long_diagonal = 2 * diagonal_ratio_denom / sqrt(diagonal_ratio_num**2 + diagonal_ratio_denom**2)
+    _check_degrees(acute_angle, degrees)
+
+    return _equilateral(
+        [acute_angle, pi - acute_angle, acute_angle],
+        short_diagonal,
+        long_diagonal)
+
+
+# The angles opposite of each other of all flat hexagons, keyed by that angle
+# rounded to degrees.
+_flat_hexagon_opposite_angles = {
+    117: 2 * atan(GoldenRatio),
+    90: pi / 2,
+    109: 2 * atan(sqrt(2)),
+    63: 2 * atan(1 / GoldenRatio),
+    71: 2 * atan(1 / sqrt(2))}
+
+
+def flat_hexagon(degrees):
+    opposite_angle = _flat_hexagon_opposite_angles[degrees]
+    other_angle = pi - opposite_angle / 2
+    _check_degrees(opposite_angle, degrees)
+
+    return _equilateral(
+        [other_angle, opposite_angle, other_angle, other_angle, opposite_angle])
+
+
+def special_tile(polygon_name):
+    angles = dict(
+        rectangle=[pi, pi/2, pi/2, pi, pi/2],
+        triamond=[pi/3, 2*pi/3, 2*pi/3, pi/3])[polygon_name]
+
+    return _equilateral(angles)
+
+
+def _non_equilateral_regular(angles, edges):
+    if len(edges) == 4:
+        diagonal = edges[0] * sqrt(2)
+
+        return Geometry(angles, edges, diagonal, diagonal)
+    else:
+        return Geometry(angles, edges)
+
+
+def scaled_regular_polygon(num_sides, scale_desc):
+    scale = {'sqrt2': sqrt(2), 'Phi': GoldenRatio, '2': 2}[scale_desc]
+
+    angles = {
+        3: [pi/3] * 3,
+        4: [pi/2] * 4,
+        5: [3*pi/5] * 5,
+        6: [2*pi/3] * 6}[num_sides]
+
+    return _non_equilateral_regular(angles, [scale] * num_sides)
+
+
+def special_scale_polygon(polygon_name):
+    edge = {
+        # Truncated hexahedron with diagonal trigonal tunnels
+        '4-gon-0.7812': 1 + sqrt(2) - 2*sqrt(6)/3,
+
+        # Initial version of fillygon above, result of wrong math.
+        '4-gon-0.8906': 1 + sqrt(2)/2 - sqrt(6)/3}[polygon_name]
+
+    return _non_equilateral_regular([pi/2] * 4, [edge] * 4)
+
+
+def kis_triangle(polygon_name):
+    long_side = {
+        'triakis-tetrahedron': Rational(5, 3),
+        'triakis-octahedron': 1 + sqrt(2) / 2,
+        'triakis-icosahedron': 22 / (15 - sqrt(5)),
+        'tetrakis-hexahedron': Rational(4, 3),
+        'pentakis-dodecahedron': 38 / (3 * (9 + sqrt(5)))}[polygon_name]
+
+    β = acos(long_side / 2)
+    α = pi - 2*β
+
+    return Geometry([β, β, α], [long_side, 1, 1])
+
+
+def disdyakis_triangle(polygon_name):
+    a, b = {
+        'disdyakis-dodecahedron': (
+            sqrt(2*sqrt(2) + 20) / sqrt(10 - sqrt(2)),
+            3*sqrt(2*sqrt(2) + 4) / (2*sqrt(10 - sqrt(2)))),
+        'disdyakis-triacontahedron': (
+            22*sqrt(-sqrt(5) + 5)/(5*sqrt(-31*sqrt(5) + 85)),
+            3*sqrt(19*sqrt(5) + 65)/(5*sqrt(-31*sqrt(5) + 85)))}[polygon_name]
+
+    α = acos((b**2 + 1 - a**2) / (2*b))
+    β = acos((a**2 + 1 - b**2) / (2*a))
+    γ = acos((a**2 + b**2 - 1) / (2*a*b))
+
+    return Geometry([β, γ, α], [a, b, 1])
+
+
+def deltoidal_icositetrahedron():
+    α = acos((2 - sqrt(2)) / 4)
+    β = acos(-(2 + sqrt(2)) / 8)
+    a = 2 - 1 / sqrt(2)
+
+    return Geometry([α, β, α, α], [1, 1, a, a])
+
+
+def deltoidal_hexecontahedron():
+    α = acos((5 - 2 * sqrt(5)) / 10)
+    β = acos((9 * sqrt(5) - 5) / 40)
+    γ = acos(-(5 + 2 * sqrt(5)) / 20)
+    a = (7 + sqrt(5)) / 6
+
+    return Geometry([α, γ, α, β], [1, 1, a, a])
+
+
+def pentagonal_icositetrahedron():
+    # Note: 2*t + 1 approx. 1.8393 equals the tribonacci constant
+    t = (TribonacciConstant - 1) / 2
+
+    α = acos(-t)
+    β = acos(1 - 2 * t)
+    a = 1 + t
+
+    return Geometry([α, α, α, α, β], [1, 1, 1, a, a])
+
+
+def pentagonal_hexecontahedron():
+    # Note: real solution of the cubic equation: 8*t^3 + 8*t^2 - GoldenRatio^2 = 0
+    t = (cbrt(44 + 12*GoldenRatio*(9 + sqrt(81*GoldenRatio - 15)))
+       + cbrt(44 + 12*GoldenRatio*(9 - sqrt(81*GoldenRatio - 15))) - 4) / 12
+
+    α = acos(-t)
+    β = acos(1 - 2 * (1 - 2 * t**2)**2)
+    a = (1 + 2 * t) / (2 * (1 - 2 * t ** 2))
+
+    return Geometry([α, α, α, α, β], [1, 1, 1, a, a])
+
+
+def concave_dodecahedron_halfface(enantiomorph):
+    a = 2 / (sqrt(4*GoldenRatio**2 - 1) - 2*sqrt(4 - GoldenRatio**2))
+
+    if enantiomorph == 'laevo':
+        return Geometry([pi/2, 7*pi/10, pi/5, 3*pi/5], [1, a, a, a/2])
+    else:
+        return Geometry([pi/2, 3*pi/5, pi/5, 7*pi/10], [a/2, a, a, 1])
+
+
+def triangle(polygon_name):
+    angles, edges = {
+        'right-isosceles-triangle': ([pi/4, pi/2, pi/4], [1, 1, sqrt(2)]),
+        'right-isosceles-triangle-sqrt2': ([pi/4, pi/2, pi/4], [sqrt(2), sqrt(2), 2]),
+        'right-isosceles-triangle-sqrt2-double': ([pi/4, pi/2, pi/4, pi], [sqrt(2), sqrt(2), 1, 1]),
+
+        'isosceles-triangle-1-sqrt2-sqrt2': ([acos(sqrt(2)/4), acos(sqrt(2)/4), pi-2*acos(sqrt(2)/4)], [1, sqrt(2), sqrt(2)]),
+        'isosceles-triangle-sqrt2-2-2': ([acos(sqrt(2)/4), acos(sqrt(2)/4), pi-2*acos(sqrt(2)/4)], [sqrt(2), 2, 2]),
+        'isosceles-triangle-sqrt2-double-double': ([acos(sqrt(2)/4), acos(sqrt(2)/4), pi, pi-2*acos(sqrt(2)/4), pi], [sqrt(2), 1, 1, 1, 1]),
+
+        'isosceles-triangle-1-phi-phi': ([2*pi/5, 2*pi/5, pi/5], [1, GoldenRatio, GoldenRatio]),
+
+        'isosceles-triangle-1-2-2': ([acos(Rational(1,4)), acos(Rational(1,4)), pi-2*acos(Rational(1,4))], [1, 2, 2]),
+        'isosceles-triangle-1-double-double': ([acos(Rational(1,4)), acos(Rational(1,4)), pi, pi-2*acos(Rational(1,4)), pi], [1, 1, 1, 1, 1])
+    }[polygon_name]
+
+    return Geometry(angles, edges)
+
+
+def rectangle(polygon_name):
+    angles, edges = {
+        'rectangle-1-sqrt2': ([pi/2, pi/2, pi/2, pi/2], [sqrt(2), 1, sqrt(2), 1]),
+        'rectangle-1-phi': ([pi/2, pi/2, pi/2, pi/2], [GoldenRatio, 1, GoldenRatio, 1]),
+        'rectangle-1-2': ([pi/2, pi/2, pi/2, pi/2], [2, 1, 2, 1]),
+        #'rectangle-1-double': ([pi, pi/2, pi/2, pi, pi/2, pi/2], [1, 1, 1, 1, 1, 1]),
+
+        'rectangle-sqrt2-phi': ([pi/2, pi/2, pi/2, pi/2], [GoldenRatio, sqrt(2), GoldenRatio, sqrt(2)]),
+        'rectangle-sqrt2-2': ([pi/2, pi/2, pi/2, pi/2], [2, sqrt(2), 2, sqrt(2)]),
+        'rectangle-sqrt2-double': ([pi, pi/2, pi/2, pi, pi/2, pi/2], [1, sqrt(2), 1, 1, sqrt(2), 1]),
+
+        'rectangle-phi-2': ([pi/2, pi/2, pi/2, pi/2], [2, GoldenRatio, 2, GoldenRatio]),
+        'rectangle-phi-double': ([pi, pi/2, pi/2, pi, pi/2, pi/2], [1, GoldenRatio, 1, 1, GoldenRatio, 1]),
+
+        'rectangle-2-double': ([pi, pi/2, pi/2, pi, pi/2, pi/2], [1, 2, 1, 1, 2, 1])
+    }[polygon_name]
+
+    return Geometry(angles, edges)
+
+
+def edge_angle_limits(angles, filled_corners):
+    """
+    Return the minimum convex and concave angle between the edges of pieces
+    connected to each other, as a tuple.
+    """
+    if filled_corners:
+        return pi/2, pi
+    else:
+        if min(map(evaluate_float, angles)) < math.pi / 4:
+            min_edge_angle = rad(75)
+        else:
+            min_edge_angle = rad(38)
+
+        # Make pieces vertically symmetric.
+        return min_edge_angle, min_edge_angle
+
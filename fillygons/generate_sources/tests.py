@@ -42,9 +42,10 @@ def decide_test_file(decider: Decider):
         reversed_edges=[],
         fn=8)
 
-    content = template.format(
-        use_statement=use_statement(path, 'src/_fillygon.scad'),
-        fillygon_call=fillygon_call(arguments),
-        test_call=call('test', angle=angle, side_length=side_length))
+    def get_content():
+        return template.format(
+            use_statement=use_statement(path, 'src/_fillygon.scad'),
+            fillygon_call=fillygon_call(arguments),
+            test_call=call('test', angle=angle, side_length=side_length))
 
-    return GeneratedFile(path, content)
+    return GeneratedFile(path, get_content, family='tests')
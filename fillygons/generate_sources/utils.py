@@ -1,18 +1,74 @@
+import filecmp
+import functools
+import hashlib
+import json
+import math
 import os
-from textwrap import dedent
+from textwrap import dedent, indent
 
-from fillygons.utils.openscad import call, use_statement
+from fillygons.utils.expressions import evaluate_float
+from fillygons.utils.openscad import call, use_statement, serialize_value
 
 
 class GeneratedFile:
     """
     Represent a source file generated when running the Makefile.
+
+    The content and metadata are computed by the passed functions when they
+    are accessed, so that the paths of all files can be listed cheaply. The
+    same applies to the arguments of the fillygon() call of fillygon files,
+    the call itself and the canonical form of the fillygon, see
+    fillygon_canonical_form().
+
+    family names the family of polygons the file belongs to, which is used
+    to group the files when profiling. num_corners is the number of corners
+    of the fillygon of fillygon files.
     """
 
-    def __init__(self, path: str, content: str, metadata=None):
+    def __init__(
+            self, path: str, get_content, get_metadata=None,
+            get_arguments=None, family=None, num_corners=None,
+            get_call=None, get_canonical_form=None):
         self.path = path
-        self.content = content
-        self.metadata = metadata
+        self.family = family
+        self.num_corners = num_corners
+        self._get_content = get_content
+        self._get_metadata = get_metadata
+        self._get_arguments = get_arguments
+        self._get_call = get_call
+        self._get_canonical_form = get_canonical_form
+
+    @property
+    def content(self) -> str:
+        return self._get_content()
+
+    @property
+    def metadata(self):
+        if self._get_metadata is None:
+            return None
+
+        return self._get_metadata()
+
+    @property
+    def arguments(self):
+        if self._get_arguments is None:
+            return None
+
+        return self._get_arguments()
+
+    @property
+    def call(self):
+        if self._get_call is None:
+            return None
+
+        return self._get_call()
+
+    @property
+    def canonical_form(self):
+        if self._get_canonical_form is None:
+            return None
+
+        return self._get_canonical_form()
 
 
 def default_settings():
@@ -63,31 +119,416 @@ def fillygon_call(arguments):
     return call('fillygon', **all_arguments)
 
 
-def fillygon_file(path, arguments, metadata):
+def fillygon_placements(arguments):
+    """
+    Return a tuple (x, y, angle) for each corner of the fillygon produced by
+    fillygon_call() with the specified arguments, which is the corner's
+    position and the direction of its edge in the fillygon's coordinate
+    system.
+    """
+    all_arguments = dict(default_settings(), **arguments)
+    angles = [evaluate_float(i) for i in all_arguments['angles']]
+    edges = [evaluate_float(i) for i in all_arguments['edges']]
+
+    # Follows the way the corners are placed by fillygon() in
+    # src/_fillygon.scad.
+    placements = []
+    x = y = angle = 0
+
+    for i, edge in enumerate(edges):
+        placements.append((x, y, angle))
+
+        length = all_arguments['side_length_unit'] * edge
+        x += length * math.cos(math.radians(angle))
+        y += length * math.sin(math.radians(angle))
+
+        if i + 1 < len(angles):
+            angle += 180 - angles[i + 1]
+
+    return placements
+
+
+def _rotation_matrix(degrees):
+    c = math.cos(math.radians(degrees))
+    s = math.sin(math.radians(degrees))
+
+    return [[c, -s, 0], [s, c, 0]]
+
+
+def _compose(first, second):
+    # Returns the 2x3 matrix applying first after second.
+    return [
+        [
+            first[i][0] * second[0][j] + first[i][1] * second[1][j]
+            + (first[i][2] if j == 2 else 0)
+            for j in range(3)]
+        for i in range(2)]
+
+
+def fillygon_canonical_form(arguments):
+    """
+    Return a tuple (key, matrix) describing the part produced by
+    fillygon_call() with the specified arguments.
+
+    Fillygons whose parts only differ by a rotation or a reflection have the
+    same key. The corners are compared as tuples (angle, edge, reversed) of
+    the angle at the start of an edge, its length and whether its teeth are
+    reversed. Reflecting a fillygon reverses the order of its corners and
+    the direction of each edge, which mirrors the teeth of the edge, so that
+    the reversed flags are toggled. The key contains the rotation or
+    reflection of the corners which sorts first and all other arguments.
+
+    matrix is a 2x3 matrix [[a, b, x], [c, d, y]], which maps the part
+    produced by the corners in the order of the key to the part produced by
+    the specified arguments. Its determinant is -1 for a reflection.
+    """
+    all_arguments = dict(default_settings(), **arguments)
+    angles = [evaluate_float(i) for i in all_arguments.pop('angles')]
+    edges = [evaluate_float(i) for i in all_arguments.pop('edges')]
+    reversed_edges = all_arguments.pop('reversed_edges')
+    count = len(edges)
+
+    reversed_edges = \
+        list(reversed_edges) + [False] * (count - len(reversed_edges))
+
+    # Rounded so that the same values computed by different formulas match.
+    corners = [
+        (round(a, 9), round(e, 9), r)
+        for a, e, r in zip(angles, edges, reversed_edges)]
+
+    # Corner i of the reflection has the angle of corner -i and the reversed
+    # edge -i - 1.
+    reflected_corners = [
+        (
+            corners[-i % count][0],
+            corners[(-i - 1) % count][1],
+            not corners[(-i - 1) % count][2])
+        for i in range(count)]
+
+    # Tuples (order, reflected, shift) for all rotations and reflections,
+    # where corner i of the fillygon is corner i + shift of the order.
+    candidates = [
+        (c[i:] + c[:i], reflected, -i % count)
+        for reflected, c in [(False, corners), (True, reflected_corners)]
+        for i in range(count)]
+
+    order, reflected, shift = min(candidates, key=lambda x: x[:2])
+
+    # Moves the corner at the shift to the origin and its edge along the X
+    # axis, like the first corner of the fillygon.
+    x, y, angle = fillygon_placements(
+        dict(
+            all_arguments,
+            angles=[a for a, _, _ in order],
+            edges=[e for _, e, _ in order]))[shift]
+
+    matrix = _compose(_rotation_matrix(-angle), [[1, 0, -x], [0, 1, -y]])
+
+    if reflected:
+        # The reflection is placed with its first edge at the angle of the
+        # fillygon's first corner to the fillygon's first edge, mirrored
+        # along the X axis.
+        matrix = _compose(
+            [[1, 0, 0], [0, -1, 0]],
+            _compose(_rotation_matrix(-angles[0]), matrix))
+
+    key = (
+        tuple(order),
+        tuple(
+            (k, serialize_value(v)) for k, v in sorted(all_arguments.items())))
+
+    return key, matrix
+
+
+def alias_matrix(matrix, canonical_matrix):
+    """
+    Return the 2x3 matrix mapping the part of a fillygon with the canonical
+    form (key, canonical_matrix) to the part of a fillygon with the canonical
+    form (key, matrix), see fillygon_canonical_form().
+    """
+    # The inverse of the rigid transformation canonical_matrix.
+    (a, b, x), (c, d, y) = canonical_matrix
+    inverse = [[a, c, -a * x - c * y], [b, d, -b * x - d * y]]
+
+    return _compose(matrix, inverse)
+
+
+def fillygon_file(path, get_arguments, get_metadata, family, num_corners):
     template = dedent('''\
         {use_statement}
         
         render() {fillygon_call};
         ''')
 
+    # Used both for the content and by the arguments, call and canonical form
+    # properties, so that the arguments are only evaluated and serialized
+    # once.
+    get_arguments = functools.lru_cache(maxsize=None)(get_arguments)
+
+    @functools.lru_cache(maxsize=None)
+    def get_call():
+        return fillygon_call(get_arguments())
+
+    def get_content():
+        return template.format(
+            use_statement=use_statement(path, 'src/_fillygon.scad'),
+            fillygon_call=get_call())
+
+    return GeneratedFile(
+        path,
+        get_content,
+        lambda: dict(get_metadata(), path=path),
+        get_arguments,
+        family,
+        num_corners,
+        get_call,
+        lambda: fillygon_canonical_form(get_arguments()))
+
+
+def stl_path(path):
+    """
+    Return the path of the STL file compiled from the OpenSCAD file at path.
+    """
+    return os.path.splitext(path)[0] + '.stl'
+
+
+def batch_content(batch_path, parts, margin):
+    """
+    Return a tuple (content, layout) for a file which renders multiple
+    fillygons next to each other, so that they can be compiled by a single
+    run of OpenSCAD.
+
+    parts is a list of tuples (path, call, placements), where path is the
+    path of the file the fillygon was generated for, call is its fillygon()
+    call and placements are as returned by fillygon_placements(). The
+    fillygons are placed along the X axis, each in a separate range of X
+    coordinates which is at least margin larger than its corners on each
+    side. layout is a list with an entry for each part, which is used by
+    `support/openscad` to split the compiled file.
+    """
+    template = dedent('''\
+        {use_statement}
+        {parts}''')
+
+    part_template = dedent('''\
+        
+        // {stl_path}
+        translate([{x}, {y}, 0]) render() {call};
+        ''')
+
+    parts_content = []
+    layout = []
+    x_min = 0
+
+    for path, call, placements in parts:
+        xs = [x for x, _, _ in placements]
+        ys = [y for _, y, _ in placements]
+        x_max = x_min + max(xs) - min(xs) + 2 * margin
+
+        # Translation applied to the fillygon.
+        offset = [x_min + margin - min(xs), -min(ys)]
+
+        parts_content.append(
+            part_template.format(
+                stl_path=stl_path(path),
+                x=serialize_value(offset[0]),
+                y=serialize_value(offset[1]),
+                call=call))
+
+        layout.append(
+            dict(path=stl_path(path), x_min=x_min, x_max=x_max, offset=offset))
+
+        x_min = x_max
+
     content = template.format(
-        use_statement=use_statement(path, 'src/_fillygon.scad'),
-        fillygon_call=fillygon_call(arguments))
+        use_statement=use_statement(batch_path, 'src/_fillygon.scad'),
+        parts=''.join(parts_content))
+
+    return content, layout
+
+
+def _manifest_entry(digest, stat):
+    return [digest, stat.st_size, stat.st_mtime_ns]
+
+
+def write_text_file(path: str, content: str, manifest_entry=None):
+    """
+    Write the content to the file, unless it already contains it, and return
+    the manifest entry for the file.
+
+    manifest_entry is the entry returned when the file was last written. If
+    the file's size and modification time still match it, the file is not
+    read to find out whether it changed.
+    """
+    data = content.encode('utf-8')
+    digest = hashlib.sha1(data).hexdigest()
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        stat = None
+
+    if stat is not None:
+        if manifest_entry is not None \
+                and manifest_entry[1:] == [stat.st_size, stat.st_mtime_ns]:
+            current_digest = manifest_entry[0]
+        else:
+            with open(path, 'rb') as file:
+                current_digest = hashlib.sha1(file.read()).hexdigest()
+
+        # Only overwrite the file if it changed, to avoid unnecessary
+        # recompilation.
+        if current_digest == digest:
+            return _manifest_entry(digest, stat)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '~'
+
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+
+    os.replace(temp_path, path)
+
+    return _manifest_entry(digest, os.stat(path))
+
+
+class Manifest:
+    """
+    Records the content hash, size and modification time of all files
+    written using write_text_file(), keyed by their path.
+
+    Entries of files which were not written during the current run are kept
+    as long as the files exist. After writing all generated files, these are
+    stale.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self.previous_entries = json.load(file)
+        else:
+            self.previous_entries = {}
+
+        self._entries = {}
+
+    def get(self, path):
+        """
+        Return the entry recorded for the file during the previous run.
+        """
+        return self.previous_entries.get(path)
+
+    def set(self, path, entry):
+        self._entries[path] = entry
+
+    def stale_paths(self):
+        """
+        Return the paths of files which were generated by an earlier run but
+        not by the current one and which still exist.
+        """
+        return sorted(
+            i for i in self.previous_entries
+            if i not in self._entries and os.path.exists(i))
+
+    def save(self):
+        entries = {
+            k: v for k, v in self.previous_entries.items()
+            if os.path.exists(k)}
+
+        entries.update(self._entries)
+
+        temp_path = self._path + '~'
+
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(entries, file, indent=4, sort_keys=True)
+
+        os.replace(temp_path, self._path)
+
+
+class JsonListWriter:
+    """
+    Write a JSON list to a file one element at a time. The result is the
+    same as writing `json.dumps(elements, indent=4, sort_keys=True)`.
+
+    The elements are written to a temporary file, which only replaces the
+    existing file if their content differs, to avoid unnecessary
+    recompilation.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._temp_path = path + '~'
+        self._file = None
+        self._empty = True
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        self._file = open(self._temp_path, 'w', encoding='utf-8')
+        self._file.write('[')
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._empty:
+            self._file.write(']')
+        else:
+            self._file.write('\n]')
+
+        self._file.close()
+
+        if exc_type is not None:
+            os.unlink(self._temp_path)
+        elif os.path.exists(self._path) \
+                and filecmp.cmp(self._temp_path, self._path, shallow=False):
+            os.unlink(self._temp_path)
+        else:
+            os.replace(self._temp_path, self._path)
+
+    def append(self, element):
+        if not self._empty:
+            self._file.write(',')
+
+        self._file.write('\n')
+        self._file.write(
+            indent(json.dumps(element, indent=4, sort_keys=True), 4 * ' '))
+        self._empty = False
+
+
+def makefile_fragment(paths, batches=()):
+    """
+    Return the content of a makefile which sets `GENERATED_FILES` to the
+    specified paths and makes each of them depend on the target running the
+    generator.
+
+    It also sets `BATCH_STL_FILES` to the parts compiled from the files
+    written by batch_content() and `BATCHED_STL_FILES` to the parts split
+    from them. batches is a list of tuples (batch_path, paths), where paths
+    are the files the fillygons in the batch were generated for.
+    """
+    lines = ['# Written by generate_sources, do not edit.']
+    lines.append('GENERATED_FILES := \\')
+    lines.extend('\t{} \\'.format(i) for i in paths)
+    lines.append('')
+
+    lines.append('BATCH_STL_FILES := \\')
+    lines.extend('\t{} \\'.format(stl_path(i)) for i, _ in batches)
+    lines.append('')
 
-    return GeneratedFile(path, content, dict(metadata, path=path))
+    lines.append('BATCHED_STL_FILES := \\')
+    lines.extend(
+        '\t{} \\'.format(stl_path(j)) for _, i in batches for j in i)
+    lines.append('')
 
+    lines.extend('{}: __generate_sources__'.format(i) for i in paths)
 
-def write_text_file(path: str, content: str):
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as file:
-            current_content = file.read()
-    else:
-        current_content = None
+    # The batch files are written by the generator as well and the parts are
+    # written when compiling the batch.
+    for batch_path, batched_paths in batches:
+        lines.append('{} {}: __generate_sources__'.format(
+            batch_path, os.path.splitext(batch_path)[0] + '.json'))
 
-    # Only overwrite the file if it changed, to avoid unnecessary
-    # recompilation.
-    if current_content != content:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lines.append('{}: {} ;'.format(
+            ' '.join(map(stl_path, batched_paths)), stl_path(batch_path)))
 
-        with open(path, 'w', encoding='utf-8') as file:
-            file.write(content)
+    return ''.join(i + '\n' for i in lines)
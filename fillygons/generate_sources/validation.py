@@ -0,0 +1,157 @@
+"""
+Numerical checks of the geometry of the polygons, which catch mistakes in
+the formulas before any fillygons are compiled.
+"""
+
+import math
+
+import numpy
+
+from fillygons.utils.expressions import evaluate_float
+
+# Maximum distance between the end of the last edge and the start of the
+# first edge of a polygon, in units of the side length.
+closure_tolerance = 1e-6
+
+# Minimum distance between two edges of a polygon which do not share a
+# corner, in units of the side length.
+min_clearance = 0.1
+
+
+class InvalidPolygonError(Exception):
+    pass
+
+
+def polygon_vertices(angles, edges):
+    """
+    Return the corners of polygons with the specified angles and edge
+    lengths, as an array of shape (n, k + 1, 2).
+
+    angles and edges are arrays of shape (n, k) containing the angles in
+    radians and the lengths of the edges of n polygons with k corners each.
+    The corners are placed like fillygon() in src/_fillygon.scad does, i.e.
+    edge i starts at corner i, which has angle i. If the polygon is closed,
+    the last corner is at the same place as the first.
+    """
+    turns = math.pi - angles[:, 1:]
+    directions = numpy.concatenate(
+        [numpy.zeros((len(angles), 1)), numpy.cumsum(turns, axis=1)],
+        axis=1)
+
+    steps = edges[..., None] * numpy.stack(
+        [numpy.cos(directions), numpy.sin(directions)], axis=-1)
+
+    return numpy.concatenate(
+        [numpy.zeros((len(angles), 1, 2)), numpy.cumsum(steps, axis=1)],
+        axis=1)
+
+
+def _cross(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def _point_segment_distance(points, starts, ends):
+    segments = ends - starts
+    lengths_squared = numpy.sum(segments ** 2, axis=-1)
+    t = numpy.sum((points - starts) * segments, axis=-1) / lengths_squared
+    t = numpy.clip(t, 0, 1)
+    closest = starts + t[..., None] * segments
+
+    return numpy.linalg.norm(points - closest, axis=-1)
+
+
+def check_polygons(angles, edges):
+    """
+    Check polygons with the same number of corners, given as for
+    polygon_vertices(), and return a dict of arrays of shape (n,) with these
+    entries:
+
+    closure_error: Distance between the end of the last edge and the start
+    of the first edge.
+
+    winding: Sum of the exterior angles, in full turns, which is 1 or -1 for
+    a simple polygon.
+
+    self_intersecting: Whether two edges which do not share a corner
+    intersect.
+
+    clearance: Minimum distance between two edges which do not share a
+    corner, or infinity if there are no such edges.
+    """
+    num_corners = angles.shape[1]
+    vertices = polygon_vertices(angles, edges)
+
+    starts = vertices[:, :-1]
+    ends = vertices[:, 1:]
+
+    # Pairs (i, j) of edges which do not share a corner.
+    pairs = [
+        (i, j)
+        for i in range(num_corners)
+        for j in range(i + 2, num_corners)
+        if not (i == 0 and j == num_corners - 1)]
+
+    i = numpy.array([i for i, _ in pairs], dtype=int)
+    j = numpy.array([j for _, j in pairs], dtype=int)
+
+    a, b = starts[:, i], ends[:, i]
+    c, d = starts[:, j], ends[:, j]
+
+    # The segments cross if each one's ends are on different sides of the
+    # other one.
+    crossing = (_cross(b - a, c - a) * _cross(b - a, d - a) < 0) \
+        & (_cross(d - c, a - c) * _cross(d - c, b - c) < 0)
+
+    distances = numpy.min(
+        [
+            _point_segment_distance(a, c, d),
+            _point_segment_distance(b, c, d),
+            _point_segment_distance(c, a, b),
+            _point_segment_distance(d, a, b)],
+        axis=0)
+
+    distances = numpy.where(crossing, 0, distances)
+
+    return dict(
+        closure_error=numpy.linalg.norm(vertices[:, -1], axis=-1),
+        winding=numpy.sum(math.pi - angles, axis=1) / (2 * math.pi),
+        self_intersecting=numpy.any(crossing, axis=1),
+        clearance=numpy.min(distances, axis=1, initial=numpy.inf))
+
+
+def validate_polygon(polygon):
+    """
+    Raise InvalidPolygonError if the polygon, an instance of Polygon, is not
+    a closed, simple polygon, if its edges come closer than min_clearance or
+    if its number of corners differs from the one declared in its family.
+
+    Each polygon is checked on its own when the first of its files is
+    evaluated, see Polygon.checked_geometry, so that the check runs in the
+    worker evaluating the polygon's files.
+    """
+    geometry = polygon.geometry
+    angles = [evaluate_float(i) for i in geometry.angles]
+    edges = [evaluate_float(i) for i in geometry.edges]
+    results = check_polygons(numpy.array([angles]), numpy.array([edges]))
+    problems = []
+
+    if len(angles) != polygon.num_corners:
+        problems.append('has {} corners instead of {}'.format(
+            len(angles), polygon.num_corners))
+
+    if results['closure_error'][0] > closure_tolerance:
+        problems.append('is not closed (error {:.3g})'.format(
+            results['closure_error'][0]))
+
+    if abs(abs(results['winding'][0]) - 1) > closure_tolerance:
+        problems.append('winds {:.3g} times'.format(results['winding'][0]))
+
+    if results['self_intersecting'][0]:
+        problems.append('intersects itself')
+    elif results['clearance'][0] < min_clearance:
+        problems.append('has edges {:.3g} apart'.format(
+            results['clearance'][0]))
+
+    if problems:
+        raise InvalidPolygonError('Invalid polygon: {}: {}'.format(
+            polygon.polygon_name, ', '.join(problems)))
@@ -2,11 +2,13 @@ import os
 import sys
 from argparse import ArgumentParser, REMAINDER
 
-import pkg_resources
-from PIL import Image
+from fillygons.utils.toolchain import run_script
 
 
 def get_overlay(name):
+    import pkg_resources
+    from PIL import Image
+
     stream = pkg_resources.resource_stream(
         __name__,
         'resources/overlay_{}.png'.format(name))
@@ -20,6 +22,10 @@ def paste_with_transparency(image, overlay):
 
 
 def main(actual_image_paths):
+    # Imported here so that the script starts quickly when e.g. only
+    # printing its usage.
+    from PIL import Image
+
     num_test_cases = len(actual_image_paths)
     num_failures = 0
 
@@ -73,5 +79,9 @@ def parse_args():
     return parser.parse_args()
 
 
-def script_main():
+def run():
     main(**vars(parse_args()))
+
+
+def script_main():
+    run_script(__name__, run)
@@ -2,16 +2,20 @@ import math
 from argparse import ArgumentParser
 from functools import reduce
 
-import numpy
-from PIL import Image
-from PIL import ImageDraw
-
-from fillygons.testing.linalg import rotation_matrix, scale_matrix, \
-    translation_matrix
-from fillygons.testing.polyhedra import Polyhedron, dihedral_angle
+from fillygons.utils.toolchain import run_script
 
 
 def main(input_path, output_path):
+    # Imported here so that the script starts quickly when e.g. only
+    # printing its usage.
+    import numpy
+    from PIL import Image
+    from PIL import ImageDraw
+
+    from fillygons.testing.linalg import rotation_matrix, scale_matrix, \
+        translation_matrix
+    from fillygons.testing.polyhedra import Polyhedron, dihedral_angle
+
     side_length = 40
     image_size = 1024
 
@@ -105,5 +109,9 @@ def parse_args():
     return parser.parse_args()
 
 
-def script_main():
+def run():
     main(**vars(parse_args()))
+
+
+def script_main():
+    run_script(__name__, run)
@@ -1,15 +1,31 @@
-from itertools import count
+import bisect
+
+
+class _DepthReached(Exception):
+    pass
+
+
+class _Pruned(Exception):
+    pass
 
 
 class Decider:
-    def __init__(self, decisions):
+    def __init__(self, decisions, max_depth=None, conditions=None):
         self._decisions = decisions
-        self._index_iter = count(0)
+        self._index = 0
+        self._max_depth = max_depth
+        self._conditions = conditions
+        self._attributes = set()
 
     def get_item(self, collection):
-        index = next(self._index_iter)
+        index = self._index
         count = len(collection)
 
+        if index == self._max_depth:
+            raise _DepthReached()
+
+        self._index += 1
+
         if index == len(self._decisions):
             self._decisions.append(count - 1)
 
@@ -21,19 +37,203 @@ class Decider:
     def get_boolean(self):
         return self.get(False, True)
 
+    def set_attribute(self, name, value):
+        """
+        Declare the value of an attribute of the result being decided, as
+        soon as it is fixed by the decisions made so far.
 
-def iter_decisions(decision_fn):
-    decider_sequence = []
+        If conditions were passed to the enumeration and the value does not
+        satisfy the condition on that attribute, all decisions below the
+        current one are skipped.
+        """
+        self._attributes.add(name)
 
-    while True:
-        yield decision_fn(Decider(decider_sequence))
+        if self._conditions is not None:
+            condition = self._conditions.get(name)
 
-        while decider_sequence:
-            if decider_sequence[-1] > 0:
-                break
+            if condition is not None and not condition(value):
+                raise _Pruned()
+
+    def _satisfies_conditions(self):
+        # Results which do not declare all attributes that have a condition
+        # on them are skipped as well.
+        return self._conditions is None \
+            or self._attributes.issuperset(self._conditions)
+
+
+def _advance(decider_sequence, min_length):
+    """
+    Advance the sequence to the next branch of the decision tree, without
+    changing its first min_length decisions. Return False if there is none.
+    """
+    while len(decider_sequence) > min_length:
+        if decider_sequence[-1] > 0:
+            decider_sequence[-1] -= 1
+
+            return True
+
+        decider_sequence.pop()
 
-            decider_sequence.pop()
+    return False
+
+
+def iter_decision_sequences(
+        decision_fn, prefix=(), start=None, conditions=None):
+    """
+    Like iter_decisions(), but yield tuples (decisions, result), where
+    decisions can be passed to replay_decisions() to get the same result.
+    """
+    if start is None:
+        decider_sequence = list(prefix)
+    else:
+        decider_sequence = list(start)
+
+    while True:
+        decider = Decider(decider_sequence, conditions=conditions)
+
+        try:
+            result = decision_fn(decider)
+        except _Pruned:
+            # Continue with the next sibling of the decision which fixed
+            # the attribute, skipping its whole subtree.
+            del decider_sequence[decider._index:]
         else:
+            if decider._satisfies_conditions():
+                yield tuple(decider_sequence), result
+
+        if not _advance(decider_sequence, len(prefix)):
             return
 
-        decider_sequence[-1] -= 1
+
+def iter_decisions(decision_fn, prefix=(), start=None, conditions=None):
+    """
+    Yield the results of calling decision_fn for all possible decisions.
+
+    If prefix is given, only the decisions starting with that prefix, as
+    returned by split_decisions(), are enumerated. If start is given, the
+    enumeration starts at that leaf, as returned by DecisionTree.unrank(),
+    instead of the first one.
+
+    If conditions is given, it maps attribute names to functions which take
+    the value of the attribute and return whether to enumerate the results
+    with that value. Attributes are declared by decision_fn using
+    Decider.set_attribute() and results not declaring an attribute with a
+    condition are skipped.
+    """
+    for _, result in iter_decision_sequences(
+            decision_fn, prefix, start, conditions):
+        yield result
+
+
+def replay_decisions(decision_fn, decisions):
+    """
+    Call decision_fn once, making the specified decisions, as returned by
+    iter_decision_sequences().
+    """
+    decider = Decider(list(decisions), max_depth=len(decisions))
+    message = 'Decisions do not lead to a leaf: {}'.format(decisions)
+
+    try:
+        result = decision_fn(decider)
+    except _DepthReached:
+        raise ValueError(message) from None
+
+    if decider._index < len(decisions):
+        raise ValueError(message)
+
+    return result
+
+
+def split_decisions(decision_fn, count, conditions=None):
+    """
+    Split the decision tree into at least count subtrees, if possible, and
+    return their prefixes, which can be passed to iter_decisions().
+
+    The tree is split at the lowest depth at which it has enough branches.
+    Enumerating the returned prefixes in order yields the results in the
+    same order as enumerating the whole tree. decision_fn is run up to that
+    depth for each subtree, so the decisions up to there should be cheap.
+    Subtrees already pruned by conditions are not returned.
+    """
+    depth = 0
+
+    while True:
+        prefixes = []
+        decider_sequence = []
+        reached_depth = False
+
+        while True:
+            decider = Decider(
+                decider_sequence, max_depth=depth, conditions=conditions)
+
+            try:
+                decision_fn(decider)
+            except _DepthReached:
+                reached_depth = True
+                prefixes.append(tuple(decider_sequence))
+            except _Pruned:
+                del decider_sequence[decider._index:]
+            else:
+                if decider._satisfies_conditions():
+                    prefixes.append(tuple(decider_sequence))
+
+            if not _advance(decider_sequence, 0):
+                break
+
+        if len(prefixes) >= count or not reached_depth:
+            return prefixes
+
+        depth += 1
+
+
+class DecisionTree:
+    """
+    The leaves of the decision tree of a decision function, recorded by
+    enumerating all its decisions once. This allows counting the leaves
+    below any prefix of decisions and finding the leaf with a specific rank,
+    i.e. index in the order of iter_decisions().
+
+    decision_fn is called for every leaf, so it should defer any expensive
+    work to when its result is actually used. If conditions are given, as
+    for iter_decisions(), only the leaves satisfying them are recorded.
+    """
+
+    def __init__(self, decision_fn, conditions=None):
+        sequences = iter_decision_sequences(
+            decision_fn, conditions=conditions)
+
+        # Decisions count down while enumerating, so the negated decisions
+        # of the leaves are sorted in ascending order.
+        self._keys = [
+            tuple(-i for i in decisions) for decisions, _ in sequences]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def count(self, prefix=()):
+        """
+        Return the number of leaves whose decisions start with prefix.
+        """
+        if not prefix:
+            return len(self._keys)
+
+        start_key = tuple(-i for i in prefix)
+        stop_key = start_key[:-1] + (start_key[-1] + 1,)
+
+        return bisect.bisect_left(self._keys, stop_key) \
+            - bisect.bisect_left(self._keys, start_key)
+
+    def unrank(self, rank):
+        """
+        Return the decisions of the leaf with the specified rank.
+        """
+        return tuple(-i for i in self._keys[rank])
+
+    def shard_bounds(self, index, count):
+        """
+        Return the ranks (start, stop) of the index-th of count slices of
+        about the same size, where index starts at 1.
+        """
+        return (
+            len(self) * (index - 1) // count,
+            len(self) * index // count)
@@ -0,0 +1,194 @@
+import contextlib
+import json
+import os
+
+from fillygons.utils.profiling import sympy_time
+
+
+def _sympy_version():
+    import sympy
+
+    return sympy.__version__
+
+
+def _empty_additions():
+    return dict(floats={}, latex={})
+
+
+class ExpressionCache:
+    """
+    Cache for the numerical values and LaTeX representations of sympy
+    expressions.
+
+    Expressions are keyed by their `srepr()`, which is stable between runs.
+    When a path is given, the cache is loaded from and saved to that file. A
+    file written by a different version of sympy is ignored.
+
+    Sympy is only imported when the cache is actually used.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._keys = {}
+        self._floats = {}
+        self._latex = {}
+        self._additions = _empty_additions()
+        self._modified = False
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+
+        self._loaded = True
+
+        if self._path is not None and os.path.exists(self._path):
+            with open(self._path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+
+            if data.get('sympy_version') == _sympy_version():
+                self._floats = data['floats']
+                self._latex = data['latex']
+
+    def _key(self, expr):
+        from sympy import srepr
+
+        self._load()
+
+        # Computing the srepr() of a large expression is not free, so it is
+        # only done once per expression and run.
+        key = self._keys.get(expr)
+
+        if key is None:
+            with sympy_time():
+                key = self._keys[expr] = srepr(expr)
+
+        return key
+
+    def float(self, expr):
+        if isinstance(expr, (int, float)):
+            return float(expr)
+
+        key = self._key(expr)
+        value = self._floats.get(key)
+
+        if value is None:
+            with sympy_time():
+                value = self._floats[key] = float(expr)
+
+            self._additions['floats'][key] = value
+            self._modified = True
+
+        return value
+
+    def latex(self, expr):
+        from sympy import latex
+
+        if isinstance(expr, (int, float)):
+            with sympy_time():
+                return latex(expr, inv_trig_style='full')
+
+        key = self._key(expr)
+        value = self._latex.get(key)
+
+        if value is None:
+            with sympy_time():
+                value = self._latex[key] = latex(expr, inv_trig_style='full')
+
+            self._additions['latex'][key] = value
+            self._modified = True
+
+        return value
+
+    def take_additions(self):
+        """
+        Return the entries added since the last call, in a form which can be
+        passed to merge() of a cache in a different process.
+        """
+        additions = self._additions
+        self._additions = _empty_additions()
+
+        return additions
+
+    def merge(self, additions):
+        self._load()
+
+        if additions['floats'] or additions['latex']:
+            self._floats.update(additions['floats'])
+            self._latex.update(additions['latex'])
+            self._modified = True
+
+    def save(self):
+        """
+        Write the cache back to its file, if anything was added to it.
+        """
+        if self._path is None or not self._modified:
+            return
+
+        data = dict(
+            sympy_version=_sympy_version(),
+            floats=self._floats,
+            latex=self._latex)
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        temp_path = self._path + '~'
+
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, sort_keys=True)
+
+        os.replace(temp_path, self._path)
+        self._modified = False
+
+
+_cache = ExpressionCache()
+
+
+def evaluate_float(expr):
+    """
+    Return the value of the expression as a float, using the active cache.
+    """
+    return _cache.float(expr)
+
+
+def evaluate_latex(expr):
+    """
+    Return the LaTeX representation of the expression, using the active
+    cache.
+    """
+    return _cache.latex(expr)
+
+
+def take_additions():
+    """
+    Return the entries added to the active cache since the last call.
+    """
+    return _cache.take_additions()
+
+
+def load_cache(path):
+    """
+    Use a cache loaded from the specified path for all further evaluations,
+    without ever saving it. This is used in worker processes, which pass the
+    added entries to the main process using take_additions().
+    """
+    global _cache
+
+    _cache = ExpressionCache(path)
+
+
+@contextlib.contextmanager
+def persistent_cache(path):
+    """
+    Use a cache stored at the specified path for all evaluations within the
+    context and save it when the context is left.
+    """
+    global _cache
+
+    previous_cache = _cache
+    _cache = ExpressionCache(path)
+
+    try:
+        yield _cache
+        _cache.save()
+    finally:
+        _cache = previous_cache
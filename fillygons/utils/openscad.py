@@ -1,7 +1,8 @@
 import json
 import os
+import sys
 
-from sympy import Expr
+from fillygons.utils.expressions import evaluate_float
 
 
 class Expression(str):
@@ -16,13 +17,21 @@ def call(function, **arguments):
     return Expression('{}({})'.format(function, ', '.join(args_str)))
 
 
+def _is_sympy_expression(value):
+    # Sympy is not imported here, as it takes a considerable amount of time.
+    # If it has not been imported yet, there can't be any sympy expressions.
+    sympy = sys.modules.get('sympy')
+
+    return sympy is not None and isinstance(value, sympy.Expr)
+
+
 def serialize_value(value):
     if isinstance(value, list):
         return '[{}]'.format(', '.join(map(serialize_value, value)))
     elif isinstance(value, Expression):
         return value
-    elif isinstance(value, Expr):
-        return str(float(value))
+    elif _is_sympy_expression(value):
+        return str(evaluate_float(value))
     else:
         return json.dumps(value)
 
@@ -0,0 +1,178 @@
+import contextlib
+import gc
+import sys
+import time
+
+
+def _empty_totals():
+    return dict(
+        files=0,
+        seconds=0.,
+        sympy_seconds=0.,
+        allocated_blocks=0,
+        gc_collections=0)
+
+
+def _gc_collections():
+    return sum(i['collections'] for i in gc.get_stats())
+
+
+class Profile:
+    """
+    Collects the time and allocations spent generating files, grouped by the
+    family of polygons the files belong to.
+
+    For each family, the wall time, the part of it spent in sympy, the net
+    number of memory blocks allocated and the number of garbage collections
+    triggered by allocations are recorded. Time spent in sympy is only
+    recorded where it is marked using sympy_time().
+    """
+
+    def __init__(self):
+        self.families = {}
+        self._sympy_depth = 0
+        self._sympy_seconds = 0.
+
+    @contextlib.contextmanager
+    def family(self, name):
+        start = time.perf_counter()
+        start_sympy_seconds = self._sympy_seconds
+        start_blocks = sys.getallocatedblocks()
+        start_collections = _gc_collections()
+
+        try:
+            yield
+        finally:
+            totals = self.families.get(name)
+
+            if totals is None:
+                totals = self.families[name] = _empty_totals()
+
+            totals['files'] += 1
+            totals['seconds'] += time.perf_counter() - start
+            totals['sympy_seconds'] += \
+                self._sympy_seconds - start_sympy_seconds
+            totals['allocated_blocks'] += \
+                sys.getallocatedblocks() - start_blocks
+            totals['gc_collections'] += _gc_collections() - start_collections
+
+    @contextlib.contextmanager
+    def sympy_time(self):
+        # Nested calls are only counted once.
+        self._sympy_depth += 1
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self._sympy_depth -= 1
+
+            if not self._sympy_depth:
+                self._sympy_seconds += time.perf_counter() - start
+
+    def take_families(self):
+        """
+        Return the totals recorded since the last call, in a form which can
+        be passed to merge() of a profile in a different process.
+        """
+        families = self.families
+        self.families = {}
+
+        return families
+
+    def merge(self, families):
+        for name, totals in families.items():
+            own_totals = self.families.setdefault(name, _empty_totals())
+
+            for k, v in totals.items():
+                own_totals[k] += v
+
+
+class _NoProfile:
+    # Used when profiling is disabled, so that marking code which should be
+    # profiled costs next to nothing.
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_no_profile = _NoProfile()
+_profile = None
+
+
+def family(name):
+    """
+    Return a context manager recording the time and allocations spent in it
+    as spent on the specified family of polygons, if profiling is enabled.
+    """
+    if _profile is None:
+        return _no_profile
+
+    return _profile.family(name)
+
+
+def sympy_time():
+    """
+    Return a context manager marking the time spent in it as spent in sympy,
+    if profiling is enabled.
+    """
+    if _profile is None:
+        return _no_profile
+
+    return _profile.sympy_time()
+
+
+def is_enabled():
+    return _profile is not None
+
+
+def take_families():
+    """
+    Return the totals recorded by the active profile since the last call, or
+    None if profiling is disabled.
+    """
+    if _profile is None:
+        return None
+
+    return _profile.take_families()
+
+
+def merge_families(families):
+    """
+    Add the totals returned by take_families() in a different process to the
+    active profile.
+    """
+    if _profile is not None:
+        _profile.merge(families)
+
+
+def enable_profile():
+    """
+    Start recording a profile for all further code and return it. This is
+    used in worker processes, which pass the totals to the main process
+    using take_families().
+    """
+    global _profile
+
+    _profile = Profile()
+
+    return _profile
+
+
+@contextlib.contextmanager
+def active_profile():
+    """
+    Record a profile for all code within the context.
+    """
+    global _profile
+
+    previous_profile = _profile
+    _profile = Profile()
+
+    try:
+        yield _profile
+    finally:
+        _profile = previous_profile
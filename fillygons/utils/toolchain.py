@@ -0,0 +1,302 @@
+import contextlib
+import importlib
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import traceback
+from argparse import ArgumentParser
+
+# Path of the socket on which the server listens, unless overridden using
+# the environment variable named by socket_path_variable.
+default_socket_path = 'build/toolchain.sock'
+socket_path_variable = 'FILLYGONS_TOOLCHAIN_SOCKET'
+
+# Modules of the console scripts which can be run by the server.
+script_modules = [
+    'fillygons.generate_sources',
+    'fillygons.testing.render_stl',
+    'fillygons.testing.check_test_cases']
+
+# Modules which take a long time to import and are imported by the server
+# before accepting connections.
+preloaded_modules = script_modules + [
+    'fillygons.generate_sources.geometry',
+    'fillygons.testing.polyhedra',
+    'numpy',
+    'stl.mesh',
+    'PIL.Image',
+    'PIL.ImageDraw',
+    'pkg_resources']
+
+
+def get_socket_path():
+    return os.environ.get(socket_path_variable, default_socket_path)
+
+
+def _send_message(connection, message):
+    connection.sendall(json.dumps(message).encode() + b'\n')
+
+
+def _receive_message(connection):
+    """
+    Return the message sent by the other side or None if the connection was
+    closed without sending one.
+    """
+    data = b''
+
+    while not data.endswith(b'\n'):
+        chunk = connection.recv(1 << 16)
+
+        if not chunk:
+            return None
+
+        data += chunk
+
+    return json.loads(data.decode())
+
+
+def _run_remote(module, argv):
+    """
+    Run the script on the server and return its exit code, or None if no
+    server is running or the server could not run the script.
+    """
+    socket_path = get_socket_path()
+
+    # Checked first because this is the common case and cheaper than trying
+    # to connect.
+    if not os.path.exists(socket_path):
+        return None
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+            _send_message(
+                connection,
+                dict(
+                    module=module,
+                    argv=argv,
+                    cwd=os.getcwd(),
+                    env=dict(os.environ)))
+
+            response = _receive_message(connection)
+        except (
+                ConnectionRefusedError, ConnectionResetError, BrokenPipeError,
+                FileNotFoundError):
+            # The server is not running or exited before responding.
+            return None
+
+    if response is None:
+        return None
+
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+
+    return response['exit_code']
+
+
+def run_script(module, run):
+    """
+    Run a console script, either on the server started by `toolchain_server`
+    if one is running, or else by calling run in this process.
+
+    module is the name of the module containing the script, which must have
+    a function `run()` doing the same as the passed function.
+    """
+    exit_code = _run_remote(module, sys.argv[1:])
+
+    if exit_code is None:
+        run()
+    else:
+        sys.exit(exit_code)
+
+
+def _source_stamps():
+    # Modification times of the source files of all loaded modules of this
+    # project, used to detect when the server runs outdated code.
+    package_dir = os.path.dirname(os.path.dirname(__file__))
+    stamps = {}
+
+    for i in list(sys.modules.values()):
+        path = getattr(i, '__file__', None)
+
+        if path is not None and path.startswith(package_dir):
+            stamps[path] = os.stat(path).st_mtime_ns
+
+    return stamps
+
+
+def _stamps_changed(stamps):
+    for path, mtime_ns in stamps.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                return True
+        except FileNotFoundError:
+            return True
+
+    return False
+
+
+def _exit_code(exit):
+    if exit.code is None:
+        return 0
+    elif isinstance(exit.code, int):
+        return exit.code
+    else:
+        print(exit.code, file=sys.stderr)
+
+        return 1
+
+
+def _handle_request(request):
+    """
+    Run a script as requested by a client in this process, which is forked
+    from the server, and return the response.
+    """
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+
+    with contextlib.redirect_stdout(stdout), \
+            contextlib.redirect_stderr(stderr):
+        try:
+            if request['module'] not in script_modules:
+                raise Exception(
+                    'Not a script module: {}'.format(request['module']))
+
+            os.chdir(request['cwd'])
+
+            # Applied to this process so that the script and the programs
+            # it runs see the same environment as when run by the client.
+            os.environ.clear()
+            os.environ.update(request['env'])
+
+            sys.argv = [request['module']] + request['argv']
+            importlib.import_module(request['module']).run()
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = _exit_code(e)
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+
+    return dict(
+        exit_code=exit_code,
+        stdout=stdout.getvalue(),
+        stderr=stderr.getvalue())
+
+
+def _serve_connection(connection):
+    # Runs in the forked process, which should handle signals as usual.
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    with connection:
+        request = _receive_message(connection)
+
+        # The modules have already been imported from the server's search
+        # path. Closing the connection without a response makes the client
+        # run the script itself.
+        if request is not None and request['env'].get('PYTHONPATH') \
+                == os.environ.get('PYTHONPATH'):
+            _send_message(connection, _handle_request(request))
+
+
+def serve(socket_path):
+    """
+    Listen on the socket and run the scripts requested by clients, each in
+    a process forked from this one so that they share the preloaded
+    modules but not any other state. The scripts are run with the working
+    directory and environment of the client. Clients with a different
+    PYTHONPATH run the scripts themselves.
+
+    Stops when the source files of the project change, after which clients
+    run the scripts in their own process until the server is restarted.
+    """
+    for i in preloaded_modules:
+        try:
+            importlib.import_module(i)
+        except ImportError as e:
+            print('Warning: Could not preload {}: {}'.format(i, e))
+
+    stamps = _source_stamps()
+
+    if os.path.exists(socket_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(socket_path)
+            except ConnectionRefusedError:
+                # Left over from a server which did not exit cleanly.
+                os.unlink(socket_path)
+            else:
+                raise Exception(
+                    'A server is already listening on {}.'.format(
+                        socket_path))
+
+    os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+
+    # Let the kernel reap the forked processes.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    # Make sure that the socket is removed when being terminated.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit())
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(socket_path)
+
+        try:
+            server.listen()
+            print('Listening on {}.'.format(socket_path))
+
+            while True:
+                connection, _ = server.accept()
+
+                if _stamps_changed(stamps):
+                    # Closing the connection without a response makes the
+                    # client fall back to running the script itself.
+                    connection.close()
+                    print('Source files changed, exiting.')
+
+                    break
+
+                if os.fork():
+                    connection.close()
+                else:
+                    try:
+                        server.close()
+                        _serve_connection(connection)
+                    finally:
+                        os._exit(0)
+        finally:
+            os.unlink(socket_path)
+
+
+def main(socket_path):
+    if socket_path is None:
+        socket_path = get_socket_path()
+
+    try:
+        serve(socket_path)
+    except KeyboardInterrupt:
+        pass
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Run a server which runs the console scripts of this '
+                    'project with their dependencies already imported. '
+                    'The scripts use the server automatically while it is '
+                    'running.')
+
+    parser.add_argument(
+        '--socket',
+        dest='socket_path',
+        help='Path of the socket to listen on. Defaults to the value of {} '
+             'or else {}.'.format(socket_path_variable, default_socket_path))
+
+    return parser.parse_args()
+
+
+def script_main():
+    main(**vars(parse_args()))
@@ -11,4 +11,7 @@ setup(
         console_scripts=[
             'generate_sources = fillygons.generate_sources:script_main',
             'render_stl = fillygons.testing.render_stl:script_main',
-            'check_test_cases = fillygons.testing.check_test_cases:script_main']))
+            'check_test_cases = fillygons.testing.check_test_cases:script_main',
+            'benchmark_sources = fillygons.benchmarks:script_main',
+            'benchmark_startup = fillygons.benchmarks.startup:script_main',
+            'toolchain_server = fillygons.utils.toolchain:script_main']))
@@ -1,5 +1,5 @@
 import sys, os, shutil
-from lib import util, make
+from lib import util, make, cache, telemetry
 
 
 def _asymptote(in_path, out_path, asymptote_dir, working_dir):
@@ -32,26 +32,31 @@ def _asymptote(in_path, out_path, asymptote_dir, working_dir):
 	return loaded_files
 
 
+def _compile(in_path, out_path):
+	with util.TemporaryDirectory() as temp_dir:
+		absolute_in_path = os.path.abspath(in_path)
+		temp_out_path = os.path.join(temp_dir, 'out.pdf')
+		
+		# Asymptote creates A LOT of temp files (presumably when invoking LaTeX) and leaves some of them behind. Thus we run asymptote in a temporary directory.
+		loaded_files = _asymptote(absolute_in_path, 'out', os.path.dirname(absolute_in_path), temp_dir)
+		
+		if not os.path.exists(temp_out_path):
+			raise util.UserError('Asymptote did not generate a PDF file.', in_path)
+		
+		# All dependencies as paths relative to the project root.
+		dependencies = set(map(os.path.relpath, loaded_files))
+		
+		# Write output files.
+		make.write_dependencies(out_path + '.d', out_path, dependencies - { in_path })
+		shutil.copyfile(temp_out_path, out_path)
+	
+	return list(dependencies)
+
+
 @util.main
 def main(in_path, out_path):
 	try:
-		_, out_suffix = os.path.splitext(out_path)
-		
-		with util.TemporaryDirectory() as temp_dir:
-			absolute_in_path = os.path.abspath(in_path)
-			temp_out_path = os.path.join(temp_dir, 'out.pdf')
-			
-			# Asymptote creates A LOT of temp files (presumably when invoking LaTeX) and leaves some of them behind. Thus we run asymptote in a temporary directory.
-			loaded_files = _asymptote(absolute_in_path, 'out', os.path.dirname(absolute_in_path), temp_dir)
-			
-			if not os.path.exists(temp_out_path):
-				raise util.UserError('Asymptote did not generate a PDF file.', in_path)
-			
-			# All dependencies as paths relative to the project root.
-			dependencies = set(map(os.path.relpath, loaded_files))
-			
-			# Write output files.
-			make.write_dependencies(out_path + '.d', out_path, dependencies - { in_path })
-			shutil.copyfile(temp_out_path, out_path)
+		with telemetry.measure('asymptote', out_path) as record:
+			record['restored'] = cache.run_cached(__file__, os.environ['ASYMPTOTE'], None, [in_path], [out_path + '.d', out_path], lambda: _compile(in_path, out_path))
 	except util.UserError as e:
 		raise util.UserError('While processing {}: {}', in_path, e)
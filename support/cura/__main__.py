@@ -1,5 +1,5 @@
 import os
-from lib import util
+from lib import util, cache, telemetry
 
 
 def _cura(in_path, out_path, profile_path):
@@ -26,7 +26,13 @@ def _cura(in_path, out_path, profile_path):
 
 @util.main
 def main(in_path, out_path, profile_path):
-	try:
+	def run():
 		_cura(in_path, out_path, profile_path)
+		
+		return []
+	
+	try:
+		with telemetry.measure('cura', out_path) as record:
+			record['restored'] = cache.run_cached(__file__, os.environ['CURA'], None, [in_path, profile_path], [out_path], run)
 	except util.UserError as e:
 		raise util.UserError('While processing {}: {}', in_path, e)
@@ -1,5 +1,5 @@
 import os, shutil
-from lib import util
+from lib import util, cache, telemetry
 from . import effect, inkscape
 
 
@@ -36,29 +36,38 @@ def _unfuck_svg_document(temp_svg_path):
 	command_line.run()
 
 
+def _export(in_path, out_path):
+	_, out_suffix = os.path.splitext(out_path)
+	
+	effect.ExportEffect.check_document_units(in_path)
+	
+	with util.TemporaryDirectory() as temp_dir:
+		temp_svg_path = os.path.join(temp_dir, os.path.basename(in_path))
+		
+		shutil.copyfile(in_path, temp_svg_path)
+		
+		_unfuck_svg_document(temp_svg_path)
+		
+		export_effect = effect.ExportEffect()
+		export_effect.affect(args = [temp_svg_path], output = False)
+		
+	with open(out_path, 'w') as file:
+		if out_suffix == '.dxf':
+			export_effect.write_dxf(file)
+		elif out_suffix == '.asy':
+			export_effect.write_asy(file)
+		else:
+			raise Exception('Unknown file type: {}'.format(out_suffix))
+	
+	return []
+
+
 @util.main
 def main(in_path, out_path):
+	settings = dict(dxf_flatness = os.environ.get('DXF_FLATNESS'))
+	
 	try:
-		_, out_suffix = os.path.splitext(out_path)
-		
-		effect.ExportEffect.check_document_units(in_path)
-		
-		with util.TemporaryDirectory() as temp_dir:
-			temp_svg_path = os.path.join(temp_dir, os.path.basename(in_path))
-			
-			shutil.copyfile(in_path, temp_svg_path)
-			
-			_unfuck_svg_document(temp_svg_path)
-			
-			export_effect = effect.ExportEffect()
-			export_effect.affect(args = [temp_svg_path], output = False)
-			
-		with open(out_path, 'w') as file:
-			if out_suffix == '.dxf':
-				export_effect.write_dxf(file)
-			elif out_suffix == '.asy':
-				export_effect.write_asy(file)
-			else:
-				raise Exception('Unknown file type: {}'.format(out_suffix))
+		with telemetry.measure('inkscape', out_path) as record:
+			record['restored'] = cache.run_cached(__file__, os.environ['INKSCAPE'], settings, [in_path], [out_path], lambda: _export(in_path, out_path))
 	except util.UserError as e:
 		raise util.UserError('While processing {}: {}', in_path, e)
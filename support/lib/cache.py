@@ -0,0 +1,287 @@
+import os, json, errno, fcntl, shutil, hashlib, tempfile, contextlib, distutils.spawn
+from . import util
+
+
+# Directory containing the cache. The cache is disabled if this is not set.
+_dir_variable = 'ARTIFACT_CACHE_DIR'
+
+# Maximum size of the cached files in MiB.
+_size_variable = 'ARTIFACT_CACHE_SIZE'
+_default_size = 2048
+
+
+def _hash_file(path):
+	hash = hashlib.sha1()
+	
+	with open(path, 'rb') as file:
+		for i in iter(lambda: file.read(1 << 16), b''):
+			hash.update(i)
+	
+	return hash.hexdigest()
+
+
+def _hash_value(value):
+	return hashlib.sha1(json.dumps(value, sort_keys = True).encode()).hexdigest()
+
+
+def _try_hash_file(path):
+	try:
+		return _hash_file(path)
+	except IOError:
+		return None
+
+
+def _tool_stamp(tool):
+	"""
+	Identify the installed version of a tool by the path, size and modification time of its executable, which is much cheaper than running it to ask for its version.
+	"""
+	
+	path = distutils.spawn.find_executable(tool) or tool
+	path = os.path.realpath(path)
+	
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return [path]
+	
+	return [path, stat.st_size, stat.st_mtime]
+
+
+def _wrapper_hash(module_file):
+	"""
+	Return a hash of the source files of the wrapper package containing the specified module and of this package, so that changes to a wrapper invalidate its cached results.
+	"""
+	
+	dirs = [os.path.dirname(os.path.abspath(module_file)), os.path.dirname(os.path.abspath(__file__))]
+	hashes = []
+	
+	for dir in dirs:
+		for name in sorted(os.listdir(dir)):
+			if os.path.splitext(name)[1] in ['.py', '.txt']:
+				hashes.append([name, _hash_file(os.path.join(dir, name))])
+	
+	return _hash_value(hashes)
+
+
+class _Cache(object):
+	"""
+	Content-addressed cache of the files produced by the wrappers.
+	
+	The results of a wrapper invocation are looked up in two steps: A manifest is keyed by everything known before running the tool, i.e. the tool, the wrapper, the settings and the content of the input files. It lists the dependencies discovered by earlier runs together with their content hashes and the artifact produced with them. If all dependencies of an entry still have the same content, the files of its artifact are restored.
+	
+	Artifacts which have not been used for the longest time are removed when the total size of the cache exceeds its limit.
+	"""
+	
+	def __init__(self, dir, max_size):
+		self._dir = dir
+		self._max_size = max_size
+		self._objects_dir = os.path.join(dir, 'objects')
+		self._manifests_dir = os.path.join(dir, 'manifests')
+		self._stats_path = os.path.join(dir, 'stats.json')
+		
+		for i in [self._objects_dir, self._manifests_dir]:
+			if not os.path.exists(i):
+				try:
+					os.makedirs(i)
+				except OSError as e:
+					if e.errno != errno.EEXIST:
+						raise
+	
+	@contextlib.contextmanager
+	def _locked(self):
+		# Serializes updates from concurrently running wrappers.
+		with open(os.path.join(self._dir, 'lock'), 'a') as file:
+			fcntl.flock(file, fcntl.LOCK_EX)
+			
+			try:
+				yield
+			finally:
+				fcntl.flock(file, fcntl.LOCK_UN)
+	
+	def _read_json(self, path, default):
+		try:
+			with open(path, 'r') as file:
+				return json.load(file)
+		except IOError:
+			return default
+	
+	def _write_json(self, path, value):
+		util.write_file(path, json.dumps(value, indent = 4, sort_keys = True).encode())
+	
+	def _manifest_path(self, key):
+		return os.path.join(self._manifests_dir, key + '.json')
+	
+	def _object_dir(self, key):
+		return os.path.join(self._objects_dir, key)
+	
+	def _count(self, tool, name, count = 1):
+		with self._locked():
+			stats = self._read_json(self._stats_path, { })
+			tool_stats = stats.setdefault(tool, { })
+			tool_stats[name] = tool_stats.get(name, 0) + count
+			self._write_json(self._stats_path, stats)
+	
+	def restore(self, tool, key, out_paths):
+		"""
+		Restore the files of an artifact listed in the manifest with the specified key whose dependencies did not change and return True, or return False if there is none.
+		"""
+		
+		for entry in self._read_json(self._manifest_path(key), []):
+			if all(_try_hash_file(path) == hash for path, hash in entry['dependencies']):
+				object_dir = self._object_dir(entry['artifact'])
+				
+				try:
+					# Marks the artifact as recently used.
+					os.utime(object_dir, None)
+					
+					# Written in order, as e.g. the parts of a batch need to be newer than the STL file of the batch.
+					for i, path in enumerate(out_paths):
+						temp_path = path + '~'
+						
+						shutil.copyfile(os.path.join(object_dir, str(i)), temp_path)
+						os.rename(temp_path, path)
+				except (IOError, OSError):
+					# Evicted in the meantime.
+					continue
+				
+				self._count(tool, 'hits')
+				
+				return True
+		
+		self._count(tool, 'misses')
+		
+		return False
+	
+	def store(self, tool, key, out_paths, dependencies):
+		"""
+		Store the output files of a run under the manifest with the specified key together with the content hashes of the dependencies read by the run.
+		"""
+		
+		# The dependency files written by the tools also list the output files.
+		entry_dependencies = sorted([i, _try_hash_file(i)] for i in set(dependencies) - set(out_paths))
+		artifact = _hash_value([key, entry_dependencies])
+		temp_dir = tempfile.mkdtemp(dir = self._objects_dir)
+		
+		for i, path in enumerate(out_paths):
+			shutil.copyfile(path, os.path.join(temp_dir, str(i)))
+		
+		with self._locked():
+			object_dir = self._object_dir(artifact)
+			
+			if os.path.exists(object_dir):
+				shutil.rmtree(temp_dir)
+			else:
+				os.rename(temp_dir, object_dir)
+			
+			manifest_path = self._manifest_path(key)
+			entries = [i for i in self._read_json(manifest_path, []) if os.path.exists(self._object_dir(i['artifact'])) and i['artifact'] != artifact]
+			entries.append(dict(dependencies = entry_dependencies, artifact = artifact))
+			self._write_json(manifest_path, entries)
+			
+			self._evict()
+	
+	def _iter_objects(self):
+		# Yields tuples (last_used, size, path).
+		for name in os.listdir(self._objects_dir):
+			path = os.path.join(self._objects_dir, name)
+			
+			# Skips directories of stores in progress, which are created by mkdtemp().
+			if name.startswith('tmp'):
+				continue
+			
+			size = sum(os.path.getsize(os.path.join(path, i)) for i in os.listdir(path))
+			
+			yield os.stat(path).st_mtime, size, path
+	
+	def _evict(self):
+		objects = sorted(self._iter_objects())
+		size = sum(i for _, i, _ in objects)
+		evicted_count = 0
+		
+		for _, object_size, path in objects:
+			if size <= self._max_size:
+				break
+			
+			shutil.rmtree(path)
+			size -= object_size
+			evicted_count += 1
+		
+		if evicted_count:
+			stats = self._read_json(self._stats_path, { })
+			stats['evictions'] = stats.get('evictions', 0) + evicted_count
+			self._write_json(self._stats_path, stats)
+	
+	def stats(self):
+		objects = list(self._iter_objects())
+		stats = self._read_json(self._stats_path, { })
+		
+		return stats, len(objects), sum(i for _, i, _ in objects)
+
+
+def _get_cache():
+	dir = os.environ.get(_dir_variable)
+	
+	if not dir:
+		return None
+	
+	return _Cache(dir, int(os.environ.get(_size_variable) or _default_size) << 20)
+
+
+def run_cached(wrapper_file, tool, settings, in_paths, out_paths, run):
+	"""
+	Produce the files at out_paths by calling run() or by restoring them from the cache, if ARTIFACT_CACHE_DIR is set. Return whether they were restored.
+	
+	wrapper_file is the __file__ of the wrapper's module, tool the name of the executable it runs and settings a JSON-serializable value containing all other settings which affect the result. in_paths are the files read by the tool which are known in advance. run() needs to return a list of all other files it read, e.g. from a dependency file written by the tool.
+	
+	The output files are restored in the order in which they are listed.
+	"""
+	
+	cache = _get_cache()
+	
+	if cache is None:
+		run()
+		
+		return False
+	
+	tool_name = os.path.basename(os.path.dirname(os.path.abspath(wrapper_file)))
+	
+	key = _hash_value([
+		tool_name,
+		_tool_stamp(tool),
+		_wrapper_hash(wrapper_file),
+		settings,
+		[[i, _hash_file(i)] for i in in_paths],
+		out_paths])
+	
+	if cache.restore(tool_name, key, out_paths):
+		return True
+	
+	dependencies = run()
+	cache.store(tool_name, key, out_paths, dependencies)
+	
+	return False
+
+
+@util.main
+def main():
+	"""
+	Print the statistics of the cache.
+	"""
+	
+	cache = _get_cache()
+	
+	if cache is None:
+		raise util.UserError('{} is not set.', _dir_variable)
+	
+	stats, object_count, size = cache.stats()
+	
+	print '{:<12}{:>10}{:>10}{:>10}'.format('tool', 'hits', 'misses', 'hit rate')
+	
+	for tool, tool_stats in sorted(stats.items()):
+		if isinstance(tool_stats, dict):
+			hits = tool_stats.get('hits', 0)
+			misses = tool_stats.get('misses', 0)
+			
+			print '{:<12}{:>10}{:>10}{:>10.0%}'.format(tool, hits, misses, float(hits) / ((hits + misses) or 1))
+	
+	print '{} artifacts, {:.1f} MiB, {} evicted'.format(object_count, size / float(1 << 20), stats.get('evictions', 0))
@@ -1,5 +1,38 @@
+import re
 from . import util
 
 
+_rule_pattern = re.compile(r'^((?:\\.|[^:\\])*):(.*)$')
+_word_pattern = re.compile(r'(?:\\.|[^\s\\])+')
+
+
+def _unescape(word):
+	return re.sub(r'\\(.)', r'\1', word).replace('$$', '$')
+
+
+def read_dependencies(path):
+	"""
+	Read a makefile consisting of rules without recipes, like the ones written by `openscad -d`, and return a list of all targets and prerequisites mentioned in it.
+	
+	Lines continued with a backslash are joined and backslash-escaped characters in file names, e.g. spaces, are unescaped, like make does it.
+	"""
+	
+	content = util.read_file(path).decode()
+	
+	# Join lines continued with a backslash.
+	content = re.sub(r'\\\n', ' ', content)
+	
+	files = []
+	
+	for line in content.splitlines():
+		match = _rule_pattern.match(line)
+		
+		if match:
+			for i in match.groups():
+				files.extend(_unescape(j) for j in _word_pattern.findall(i))
+	
+	return files
+
+
 def write_dependencies(path, target, dependencies):
 	util.write_file(path, '{}: {}\n'.format(target, ' '.join(dependencies)).encode())
@@ -0,0 +1,88 @@
+import re
+from . import util
+
+
+_normal_pattern = re.compile(r'^\s*facet\s+normal\s+(\S+)\s+(\S+)\s+(\S+)\s*$')
+_vertex_pattern = re.compile(r'^\s*vertex\s+(\S+)\s+(\S+)\s+(\S+)\s*$')
+
+
+def _parse_vector(match):
+	return tuple(float(i) for i in match.groups())
+
+
+def read_ascii_facets(path):
+	"""
+	Read the facets from an ASCII STL file and return them as a list of tuples (normal, vertices), where normal is a tuple of three floats and vertices is a list of three such tuples.
+	"""
+	
+	facets = []
+	normal = None
+	vertices = []
+	
+	with open(path, 'r') as file:
+		if not file.readline().startswith('solid'):
+			raise util.UserError('Not an ASCII STL file: {}', path)
+		
+		for line in file:
+			normal_match = _normal_pattern.match(line)
+			vertex_match = _vertex_pattern.match(line)
+			
+			if normal_match:
+				normal = _parse_vector(normal_match)
+			elif vertex_match:
+				vertices.append(_parse_vector(vertex_match))
+			elif line.strip() == 'endfacet':
+				facets.append((normal, vertices))
+				vertices = []
+	
+	return facets
+
+
+def write_ascii_facets(path, facets):
+	"""
+	Write an ASCII STL file containing the specified facets, as returned by read_ascii_facets().
+	"""
+	
+	def vector(v):
+		return ' '.join(map(repr, v))
+	
+	lines = ['solid OpenSCAD_Model']
+	
+	for normal, vertices in facets:
+		lines.append('  facet normal {}'.format(vector(normal)))
+		lines.append('    outer loop')
+		lines.extend('      vertex {}'.format(vector(i)) for i in vertices)
+		lines.append('    endloop')
+		lines.append('  endfacet')
+	
+	lines.append('endsolid OpenSCAD_Model')
+	
+	util.write_file(path, ''.join(i + '\n' for i in lines).encode())
+
+
+def transform_facets(facets, matrix):
+	"""
+	Return the facets, as returned by read_ascii_facets(), with the X and Y coordinates transformed by the 2x3 matrix [[a, b, x], [c, d, y]], which must be a rotation or reflection followed by a translation.
+	
+	The order of the vertices of each facet is reversed for a reflection so that the facets keep facing outwards.
+	"""
+	
+	(a, b, x), (c, d, y) = matrix
+	reflected = a * d - b * c < 0
+	
+	def transform(v, offset_x, offset_y):
+		vx, vy, vz = v
+		
+		return a * vx + b * vy + offset_x, c * vx + d * vy + offset_y, vz
+	
+	result = []
+	
+	for normal, vertices in facets:
+		vertices = [transform(i, x, y) for i in vertices]
+		
+		if reflected:
+			vertices.reverse()
+		
+		result.append((transform(normal, 0, 0), vertices))
+	
+	return result
@@ -0,0 +1,217 @@
+import os, sys, json, time, struct, contextlib, collections
+from . import util
+
+
+# File to which a record is appended for each run of a wrapper, one JSON object per line.
+_records_path = 'build/telemetry.jsonl'
+
+_default_count = 10
+
+
+def _peak_rss(usages):
+	if not usages:
+		return None
+	
+	peak_rss = max(i.ru_maxrss for i in usages)
+	
+	# Reported in KiB on Linux but in bytes on OS X.
+	if sys.platform == 'darwin':
+		return peak_rss
+	else:
+		return peak_rss * 1024
+
+
+def _count_triangles(path):
+	"""
+	Return the number of triangles in an ASCII or binary STL file.
+	"""
+	
+	with open(path, 'rb') as file:
+		header = file.read(84)
+		
+		# A binary STL file has an 80 byte header followed by the number of triangles and 50 bytes for each triangle.
+		if len(header) == 84:
+			count, = struct.unpack('<I', header[80:])
+			
+			if 84 + 50 * count == os.path.getsize(path):
+				return count
+		
+		file.seek(0)
+		
+		return sum(1 for i in file if i.strip() == 'endfacet')
+
+
+def _append_record(record):
+	dir = os.path.dirname(_records_path)
+	
+	if not os.path.exists(dir):
+		try:
+			os.makedirs(dir)
+		except OSError:
+			# Created by another process in the meantime.
+			pass
+	
+	# Written using a single call so that records of wrappers run in parallel are not mixed up.
+	file = os.open(_records_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+	
+	try:
+		os.write(file, json.dumps(record, sort_keys = True) + '\n')
+	finally:
+		os.close(file)
+
+
+@contextlib.contextmanager
+def measure(tool, out_path):
+	"""
+	Append a record to build/telemetry.jsonl after running the enclosed block, which produces the file at out_path using the specified tool.
+	
+	The record contains the wall time, the peak resident set size of the processes run by the block, the size of the output file and, for STL files, the number of triangles. The peak RSS is taken from the resource usage of each process run using util.command_context() by the current thread, see util.collect_resource_usage(), so that it is also attributed correctly to the targets compiled in parallel by the pool of `openscad.build`. It is None if the block did not run any process, e.g. because the files were restored from the cache.
+	
+	The block can add entries to the dict it gets, e.g. whether the files were restored from the cache.
+	"""
+	
+	record = dict(tool = tool, target = out_path, time = time.time(), failed = True)
+	
+	with util.collect_resource_usage() as usages:
+		try:
+			yield record
+			
+			record['failed'] = False
+		finally:
+			record['wall_time'] = time.time() - record['time']
+			record['peak_rss'] = _peak_rss(usages)
+			
+			if os.path.exists(out_path) and not record['failed']:
+				record['output_size'] = os.path.getsize(out_path)
+				
+				if out_path.endswith('.stl'):
+					record['triangles'] = _count_triangles(out_path)
+			
+			_append_record(record)
+
+
+def _read_records():
+	if not os.path.exists(_records_path):
+		raise util.UserError('No records have been written to {} yet.', _records_path)
+	
+	with open(_records_path, 'r') as file:
+		for i in file:
+			# Skips a partially written last line.
+			try:
+				yield json.loads(i)
+			except ValueError:
+				pass
+
+
+def _format_size(size):
+	if size is None:
+		return '-'
+	
+	return '{:.1f} MiB'.format(size / float(1 << 20))
+
+
+def _format_time(timestamp):
+	return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def _print_table(title, header, rows):
+	print title
+	print '  ' + header
+	
+	for i in rows:
+		print '  ' + i
+	
+	print
+
+
+@util.main
+def main(count = _default_count):
+	"""
+	Print a summary of the records written by the wrappers: The slowest and the most memory-hungry targets, the targets whose compile time increased the most since they were compiled before and the total compile time per day.
+	
+	Only the latest record of each target is considered, except for the comparisons. Targets restored from the artifact cache or which failed are ignored, except that targets whose latest run failed are listed as well.
+	"""
+	
+	count = int(count)
+	
+	# Records of each target, in the order in which they were written.
+	records_by_target = collections.OrderedDict()
+	failed_records = { }
+	
+	for record in _read_records():
+		if record['failed']:
+			failed_records[record['target']] = record
+		else:
+			failed_records.pop(record['target'], None)
+			
+			if not record.get('restored'):
+				records_by_target.setdefault(record['target'], []).append(record)
+	
+	latest_records = [i[-1] for i in records_by_target.values()]
+	
+	def format_record(record):
+		return '{:>8.1f} s {:>10} {:>10} {:>10}  {}'.format(
+			record['wall_time'],
+			_format_size(record['peak_rss']),
+			record.get('triangles', '-'),
+			_format_size(record.get('output_size')),
+			record['target'])
+	
+	record_header = '{:>10} {:>10} {:>10} {:>10}  {}'.format('wall time', 'peak RSS', 'triangles', 'size', 'target')
+	
+	_print_table(
+		'Slowest targets:',
+		record_header,
+		map(format_record, sorted(latest_records, key = lambda x: -x['wall_time'])[:count]))
+	
+	_print_table(
+		'Most memory-hungry targets:',
+		record_header,
+		map(format_record, sorted((i for i in latest_records if i['peak_rss'] is not None), key = lambda x: -x['peak_rss'])[:count]))
+	
+	# Compares the two latest records of each target.
+	changes = [(i[-1]['wall_time'] / max(i[-2]['wall_time'], 1e-3), i[-2], i[-1]) for i in records_by_target.values() if len(i) > 1]
+	
+	def format_change(change):
+		factor, previous, latest = change
+		
+		return '{:>8.2f} x {:>10.1f} s {:>10.1f} s {:>10} {:>16}  {}'.format(
+			factor,
+			previous['wall_time'],
+			latest['wall_time'],
+			_format_size(latest['peak_rss']),
+			_format_time(previous['time']),
+			latest['target'])
+	
+	_print_table(
+		'Largest changes in wall time since the previous compilation:',
+		'{:>10} {:>12} {:>12} {:>10} {:>16}  {}'.format('factor', 'previous', 'latest', 'peak RSS', 'previous run', 'target'),
+		map(format_change, sorted(changes, key = lambda x: -x[0])[:count]))
+	
+	# Totals of all records per day, to see trends across runs.
+	days = collections.OrderedDict()
+	
+	for records in records_by_target.values():
+		for record in records:
+			days.setdefault(time.strftime('%Y-%m-%d', time.localtime(record['time'])), []).append(record)
+	
+	def format_day(item):
+		day, records = item
+		peak_rss_values = [i['peak_rss'] for i in records if i['peak_rss'] is not None]
+		
+		return '{:>10} {:>10} {:>12.1f} s {:>10}'.format(
+			day,
+			len(records),
+			sum(i['wall_time'] for i in records),
+			_format_size(max(peak_rss_values) if peak_rss_values else None))
+	
+	_print_table(
+		'Compilations per day:',
+		'{:>10} {:>10} {:>14} {:>10}'.format('day', 'targets', 'wall time', 'peak RSS'),
+		map(format_day, sorted(days.items())))
+	
+	if failed_records:
+		_print_table(
+			'Targets whose latest compilation failed:',
+			'{:>10}  {}'.format('wall time', 'target'),
+			('{:>8.1f} s  {}'.format(i['wall_time'], i['target']) for i in failed_records.values()))
@@ -1,4 +1,4 @@
-import sys, contextlib, subprocess, tempfile, shutil, re, os, inspect
+import sys, contextlib, subprocess, tempfile, shutil, re, os, inspect, errno, threading
 
 
 class UserError(Exception):
@@ -56,12 +56,64 @@ def TemporaryDirectory():
 		shutil.rmtree(dir)
 
 
+# Holds the list of the current thread to which collect_resource_usage() appends.
+_thread_state = threading.local()
+
+
+class _Process(subprocess.Popen):
+	"""
+	Popen which keeps the resource usage of the process, as returned by os.wait4(), in rusage once it has been waited for.
+	"""
+	
+	rusage = None
+	
+	def wait(self):
+		while self.returncode is None:
+			try:
+				pid, status, self.rusage = os.wait4(self.pid, 0)
+			except OSError as e:
+				if e.errno == errno.EINTR:
+					continue
+				elif e.errno != errno.ECHILD:
+					raise
+				
+				# Already waited for, so its exit status and resource usage are lost.
+				pid = self.pid
+				status = 0
+			
+			if pid == self.pid:
+				self._handle_exitstatus(status)
+		
+		return self.returncode
+
+
+@contextlib.contextmanager
+def collect_resource_usage():
+	"""
+	Yield a list to which the resource usage, as returned by os.wait4(), of each process run by command_context() in the enclosed block is appended. Only processes run by the current thread are included, so that the processes run by other threads at the same time are not attributed to the block.
+	"""
+	
+	previous_usages = getattr(_thread_state, 'usages', None)
+	usages = _thread_state.usages = []
+	
+	try:
+		yield usages
+	finally:
+		_thread_state.usages = previous_usages
+
+
 @contextlib.contextmanager
-def command_context(args, remove_env = [], set_env = { }, working_dir = None, use_stdout = True, use_stderr = False):
+def command_context(args, remove_env = [], set_env = { }, working_dir = None, use_stdout = True, use_stderr = False, output_file = None):
+	"""
+	If output_file is given, both stdout and stderr of the process are written to that file instead of being captured or passed through.
+	
+	The resource usage of the process is recorded, see collect_resource_usage().
+	"""
+	
 	env = dict(os.environ)
 	
 	for i in remove_env:
-		del env[i]
+		env.pop(i, None)
 	
 	for k, v in set_env.items():
 		env[k] = v
@@ -76,8 +128,13 @@ def command_context(args, remove_env = [], set_env = { }, working_dir = None, us
 	else:
 		stderr = None
 	
+	if output_file is not None:
+		stdout = output_file
+		stderr = subprocess.STDOUT
+	
 	try:
-		process = subprocess.Popen(args, env = env, cwd = working_dir, stdout = stdout, stderr = stderr)
+		# File descriptors are closed so that processes started concurrently from different threads do not keep each other's pipes open.
+		process = _Process(args, env = env, cwd = working_dir, stdout = stdout, stderr = stderr, close_fds = True)
 	except OSError as e:
 		raise UserError('Error running {}: {}', args[0], e)
 	
@@ -98,13 +155,18 @@ def command_context(args, remove_env = [], set_env = { }, working_dir = None, us
 		except (ValueError, OSError):
 			# Ignore exceptions here because we're just trying to get the process to complete.
 			pass
+		
+		usages = getattr(_thread_state, 'usages', None)
+		
+		if usages is not None and process.rusage is not None:
+			usages.append(process.rusage)
 	
 	if process.returncode:
 		raise UserError('Command failed: {}', ' '.join(args))
 
 
-def command(args, remove_env = [], set_env = { }, working_dir = None, use_stdout = False, use_stderr = False):
-	with command_context(args, remove_env, set_env, working_dir, use_stdout, use_stderr) as process:
+def command(args, remove_env = [], set_env = { }, working_dir = None, use_stdout = False, use_stderr = False, output_file = None):
+	with command_context(args, remove_env, set_env, working_dir, use_stdout, use_stderr, output_file) as process:
 		return process.communicate()
 
 
@@ -0,0 +1,233 @@
+import os, json, time, sqlite3
+from lib import util, make, stl, cache, telemetry
+from . import durations
+
+
+# Catalog of the generated fillygons written by generate_sources, which records the fillygons identical to another one.
+_catalog_path = 'src/variants.sqlite'
+
+
+def _mtime(path):
+	try:
+		return os.stat(path).st_mtime
+	except OSError:
+		return None
+
+
+def _openscad(in_path, out_path, deps_path, log_file):
+	util.command([os.environ['OPENSCAD'], '-o', out_path, '-d', deps_path, in_path], output_file = log_file)
+
+
+def _connected_components(facets):
+	# Returns a list with an ID for each facet, which is the same for facets connected by shared vertices.
+	parents = { }
+	
+	def find(vertex):
+		root = vertex
+		
+		while parents[root] != root:
+			root = parents[root]
+		
+		# Path compression, keeps later lookups short.
+		while parents[vertex] != root:
+			parents[vertex], vertex = root, parents[vertex]
+		
+		return root
+	
+	for _, vertices in facets:
+		for i in vertices:
+			parents.setdefault(i, i)
+		
+		first = find(vertices[0])
+		
+		for i in vertices[1:]:
+			parents[find(i)] = first
+	
+	return [find(vertices[0]) for _, vertices in facets]
+
+
+def _split_parts(in_path, layout_path):
+	"""
+	Split the STL file compiled from a file rendering multiple fillygons next to each other into an STL file for each of them.
+	
+	The layout file contains a list with an entry for each fillygon, which specifies the range of X coordinates it occupies, the translation which was applied to it and the path of the STL file to write.
+	
+	The mesh is split into its connected components, each of which is assigned to the part whose range contains the center of its bounding box. An error naming the part is raised if the bounding box reaches outside of that range, e.g. because the fillygons were placed too close to each other, or if a part is left empty.
+	"""
+	
+	with open(layout_path, 'r') as file:
+		layout = json.load(file)
+	
+	facets = stl.read_ascii_facets(in_path)
+	component_ids = _connected_components(facets)
+	
+	# Range of X coordinates of each component, keyed by its ID.
+	bounds = { }
+	
+	for (_, vertices), component_id in zip(facets, component_ids):
+		xs = [i[0] for i in vertices]
+		x_min, x_max = bounds.get(component_id, (min(xs), max(xs)))
+		bounds[component_id] = min([x_min] + xs), max([x_max] + xs)
+	
+	# Index of the part of each component, keyed by its ID.
+	part_indices = { }
+	
+	for component_id, (x_min, x_max) in bounds.items():
+		# The ranges are ordered and adjacent. Centers before or after all ranges are assigned to the first or last part.
+		center = (x_min + x_max) / 2
+		index = len([i for i in layout[1:] if i['x_min'] <= center])
+		part = layout[index]
+		
+		if x_min < part['x_min'] or x_max > part['x_max']:
+			raise util.UserError('Part {} spans x={}..{}, which reaches outside of its range x={}..{} in {}.', part['path'], x_min, x_max, part['x_min'], part['x_max'], layout_path)
+		
+		part_indices[component_id] = index
+	
+	parts = [[] for _ in layout]
+	
+	for (normal, vertices), component_id in zip(facets, component_ids):
+		index = part_indices[component_id]
+		offset_x, offset_y = layout[index]['offset']
+		
+		parts[index].append((normal, [(vx - offset_x, vy - offset_y, vz) for vx, vy, vz in vertices]))
+	
+	for part, facets in zip(layout, parts):
+		if not facets:
+			raise util.UserError('Part {} is empty in {}.', part['path'], in_path)
+		
+		stl.write_ascii_facets(part['path'], facets)
+
+
+def find_alias(in_path):
+	"""
+	Return a tuple (path, matrix) if the OpenSCAD file at in_path renders a fillygon which is identical to the one rendered by the file at path up to a rotation or reflection, and None otherwise. matrix is the 2x3 matrix mapping the fillygon at path onto the one at in_path.
+	
+	These are recorded as alias_of and alias_matrix in the catalog written by generate_sources. The catalog is only used if it is not older than the file, i.e. if it has been written since the file was last generated.
+	"""
+	
+	catalog_mtime = _mtime(_catalog_path)
+	
+	if catalog_mtime is None or catalog_mtime < _mtime(in_path):
+		return None
+	
+	connection = sqlite3.connect(_catalog_path)
+	
+	try:
+		row = connection.execute('select alias_of, alias_matrix from variants where path = ?', [os.path.relpath(in_path)]).fetchone()
+	finally:
+		connection.close()
+	
+	if row is None or row[0] is None:
+		return None
+	
+	alias_of, alias_matrix = row
+	
+	return alias_of, json.loads(alias_matrix)
+
+
+def _is_up_to_date(in_path, out_path):
+	# Whether the file compiled from in_path to out_path is newer than the source file and the dependencies recorded when compiling it.
+	deps_path = out_path + '.d'
+	out_mtime = _mtime(out_path)
+	
+	if out_mtime is None or not os.path.exists(deps_path):
+		return False
+	
+	dependency_mtimes = [_mtime(i) for i in [in_path] + make.read_dependencies(deps_path)]
+	
+	return None not in dependency_mtimes and max(dependency_mtimes) <= out_mtime
+
+
+def _derive(out_path, canonical_out_path, matrix):
+	facets = stl.transform_facets(stl.read_ascii_facets(canonical_out_path), matrix)
+	
+	# The dependency makefile is written last so that it is not older than the STL file, which it lists as its target.
+	stl.write_ascii_facets(out_path, facets)
+	make.write_dependencies(out_path + '.d', out_path, [canonical_out_path, _catalog_path])
+
+
+def _compile(in_path, out_path, layout_path, log_file):
+	cwd = os.getcwd()
+	
+	def relpath(path):
+		return os.path.relpath(path, cwd)
+	
+	with util.TemporaryDirectory() as temp_dir:
+		temp_deps_path = os.path.join(temp_dir, 'deps')
+		
+		_, out_ext = os.path.splitext(out_path)
+		
+		# OpenSCAD requires the output file name to end in .stl or .dxf.
+		temp_out_path = os.path.join(temp_dir, 'out' + out_ext)
+		
+		_openscad(in_path, temp_out_path, temp_deps_path, log_file)
+		
+		# All dependencies as paths relative to the project root.
+		deps = set(map(relpath, make.read_dependencies(temp_deps_path)))
+		
+		# Relative paths to all files that should not appear in the dependency makefile.
+		ignored_files = set(map(relpath, [in_path, temp_deps_path, temp_out_path]))
+		
+		# Write output files.
+		make.write_dependencies(out_path + '.d', out_path, deps - ignored_files)
+		util.rename_atomic(temp_out_path, out_path)
+		
+		# The parts are written after the compiled file so that they are newer.
+		if layout_path is not None:
+			_split_parts(out_path, layout_path)
+
+
+def compile_file(in_path, out_path, layout_path = None, log_file = None):
+	"""
+	Compile an OpenSCAD file to an STL or DXF file and write a dependency makefile next to it, which lists all files read by OpenSCAD. The files are restored from the artifact cache instead, if possible.
+	
+	If layout_path is given, the compiled file is additionally split into the parts listed in that file, see _split_parts(). If log_file is given, the output of OpenSCAD is written to it instead of to stdout and stderr.
+	
+	If the file renders a fillygon identical to another one, see find_alias(), and the STL file of that fillygon is up-to-date, the STL file is derived from it instead of compiling the file. The dependency makefile then lists that STL file and the catalog.
+	
+	The time taken by OpenSCAD is recorded to order later builds, see durations.order_by_duration(), and together with the used memory and the size of the result in build/telemetry.jsonl, see telemetry.measure().
+	
+	Returns whether the files were restored from the cache.
+	"""
+	
+	alias = None
+	
+	if layout_path is None and out_path.endswith('.stl'):
+		alias = find_alias(in_path)
+	
+	if alias is not None:
+		canonical_in_path, matrix = alias
+		canonical_out_path = os.path.splitext(canonical_in_path)[0] + '.stl'
+		
+		if _is_up_to_date(canonical_in_path, canonical_out_path):
+			_derive(out_path, canonical_out_path, matrix)
+			
+			if log_file is not None:
+				print >> log_file, 'Derived from {}.'.format(canonical_out_path)
+			
+			return False
+	
+	in_paths = [in_path]
+	out_paths = [out_path, out_path + '.d']
+	
+	if layout_path is not None:
+		in_paths.append(layout_path)
+		
+		with open(layout_path, 'r') as file:
+			out_paths.extend(i['path'] for i in json.load(file))
+	
+	def run():
+		start_time = time.time()
+		_compile(in_path, out_path, layout_path, log_file)
+		durations.record(in_path, out_path, time.time() - start_time)
+		
+		return make.read_dependencies(out_path + '.d')
+	
+	with telemetry.measure('openscad', out_path) as record:
+		restored = cache.run_cached(__file__, os.environ['OPENSCAD'], None, in_paths, out_paths, run)
+		record['restored'] = restored
+	
+	if restored and log_file is not None:
+		print >> log_file, 'Restored from the artifact cache.'
+	
+	return restored
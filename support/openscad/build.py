@@ -0,0 +1,243 @@
+import os, sys, json, time, threading, multiprocessing, Queue
+from lib import util, make
+from . import compile_file, find_alias, durations
+
+
+# Directory to which the output of OpenSCAD is written for each target, at the target's path with `.log` appended.
+_log_dir = 'build/logs'
+
+# Memory assumed to be needed by a single OpenSCAD process, used to limit the number of processes run in parallel.
+_memory_per_worker = 1 << 30
+
+
+def _default_worker_count():
+	cpu_count = multiprocessing.cpu_count()
+	
+	try:
+		memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+	except (ValueError, OSError):
+		return cpu_count
+	
+	return max(1, min(cpu_count, memory // _memory_per_worker))
+
+
+def _mtime(path):
+	try:
+		return os.stat(path).st_mtime
+	except OSError:
+		return None
+
+
+class _Job(object):
+	"""
+	Compilation of a single OpenSCAD file.
+	
+	If a JSON file exists next to the OpenSCAD file, it is compiled as a batch of fillygons and split into the parts listed in that file. Otherwise, if it renders a fillygon identical to another one, its STL file is derived from that of the other fillygon, see compile_file().
+	"""
+	
+	def __init__(self, out_path):
+		base_path, _ = os.path.splitext(out_path)
+		layout_path = base_path + '.json'
+		
+		self.out_path = out_path
+		self.in_path = base_path + '.scad'
+		self.layout_path = layout_path if os.path.exists(layout_path) else None
+		self.log_path = os.path.join(_log_dir, out_path + '.log')
+		self.products = [out_path]
+		
+		if self.layout_path is not None:
+			with open(self.layout_path, 'r') as file:
+				self.products.extend(i['path'] for i in json.load(file))
+			
+			self.alias = None
+		elif out_path.endswith('.stl') and os.path.exists(self.in_path):
+			self.alias = find_alias(self.in_path)
+		else:
+			self.alias = None
+		
+		# Jobs producing the file this job's STL file is derived from, set by _schedule().
+		self.prerequisites = []
+		self.started = False
+		self.compiled = False
+		self.restored = False
+		self.error = None
+	
+	def is_up_to_date(self, global_dependencies):
+		if any(i.compiled for i in self.prerequisites):
+			return False
+		
+		product_mtimes = [_mtime(i) for i in self.products + [self.out_path + '.d']]
+		
+		if None in product_mtimes:
+			return False
+		
+		dependencies = [self.in_path] + make.read_dependencies(self.out_path + '.d') + global_dependencies
+		
+		if self.layout_path is not None:
+			dependencies.append(self.layout_path)
+		
+		dependency_mtimes = [_mtime(i) for i in dependencies]
+		
+		return None not in dependency_mtimes and max(dependency_mtimes) <= min(product_mtimes)
+	
+	def run(self, global_dependencies):
+		if self.is_up_to_date(global_dependencies):
+			return
+		
+		# Written in a single call so that lines written by different threads are not mixed up.
+		sys.stdout.write('[openscad] {}\n'.format(self.out_path))
+		
+		self.started = True
+		log_dir = os.path.dirname(self.log_path)
+		
+		if not os.path.exists(log_dir):
+			try:
+				os.makedirs(log_dir)
+			except OSError:
+				# Created by another worker in the meantime.
+				pass
+		
+		with open(self.log_path, 'w') as log_file:
+			try:
+				self.restored = compile_file(self.in_path, self.out_path, self.layout_path, log_file)
+			except util.UserError as e:
+				self.error = str(e)
+				print >> log_file, 'Error:', e
+		
+		self.compiled = self.error is None
+
+
+def _schedule(jobs):
+	"""
+	Set the prerequisites of each job deriving its STL file from that of an identical fillygon to the job producing that file, so that it is derived instead of compiled.
+	"""
+	
+	jobs_by_product = { }
+	
+	for job in jobs:
+		for i in job.products:
+			jobs_by_product[i] = job
+	
+	for job in jobs:
+		if job.alias is not None:
+			canonical_in_path, _ = job.alias
+			prerequisite = jobs_by_product.get(os.path.splitext(canonical_in_path)[0] + '.stl')
+			
+			if prerequisite is not None and prerequisite is not job:
+				job.prerequisites = [prerequisite]
+
+
+def _run_jobs(jobs, worker_count, global_dependencies):
+	"""
+	Run the jobs using the specified number of worker threads, each of which runs one OpenSCAD process at a time. Jobs are started in the order in which they are passed, but only after their prerequisites have finished successfully.
+	"""
+	
+	ready_jobs = Queue.Queue()
+	finished_jobs = Queue.Queue()
+	
+	def work():
+		while True:
+			job = ready_jobs.get()
+			
+			if job is None:
+				break
+			
+			try:
+				job.run(global_dependencies)
+			except Exception as e:
+				job.error = 'Unexpected error: {}'.format(e)
+			
+			finished_jobs.put(job)
+	
+	workers = [threading.Thread(target = work) for _ in range(worker_count)]
+	
+	for i in workers:
+		# Lets the process exit when interrupted while jobs are running.
+		i.daemon = True
+		i.start()
+	
+	waiting_jobs = list(jobs)
+	done_jobs = set()
+	
+	def start_ready_jobs():
+		started_count = 0
+		changed = True
+		
+		# Repeated because failing a job may fail the jobs waiting for it.
+		while changed:
+			changed = False
+			
+			for job in list(waiting_jobs):
+				if any(i.error is not None for i in job.prerequisites):
+					job.error = 'Not compiled because the file it is derived from could not be compiled.'
+					waiting_jobs.remove(job)
+					done_jobs.add(job)
+					changed = True
+				elif all(i in done_jobs for i in job.prerequisites):
+					ready_jobs.put(job)
+					waiting_jobs.remove(job)
+					started_count += 1
+		
+		return started_count
+	
+	running_count = start_ready_jobs()
+	
+	while running_count:
+		# Uses a timeout so that the wait can be interrupted using Ctrl-C.
+		done_jobs.add(finished_jobs.get(True, 1e6))
+		running_count -= 1
+		running_count += start_ready_jobs()
+	
+	for _ in workers:
+		ready_jobs.put(None)
+	
+	for i in workers:
+		i.join()
+	
+	for job in waiting_jobs:
+		job.error = 'Not compiled because of a cycle of prerequisites.'
+
+
+@util.main
+def main(*out_paths):
+	"""
+	Compile the OpenSCAD files of the specified targets using a pool of OpenSCAD processes, skipping targets which are up-to-date. Targets are started in the order of their predicted compile time, longest first. The files written are the same as when compiling each file with `python -m openscad`.
+	
+	The number of processes is limited by the number of CPUs and the available memory and can be overridden by setting OPENSCAD_JOBS. Additional files on which all targets depend can be listed in OPENSCAD_GLOBAL_DEPS. The output of OpenSCAD is written to a log file for each target in build/logs.
+	"""
+	
+	start_time = time.time()
+	worker_count = int(os.environ.get('OPENSCAD_JOBS') or _default_worker_count())
+	global_dependencies = os.environ.get('OPENSCAD_GLOBAL_DEPS', '').split()
+	jobs = [_Job(i) for i in out_paths]
+	
+	# Starts the targets which took longest the last time first, so that they do not delay the end of the build.
+	jobs = durations.order_by_duration(jobs, [(i.in_path, i.out_path) for i in jobs])
+	
+	for i in jobs:
+		if not os.path.exists(i.in_path):
+			raise util.UserError('Source file does not exist: {}', i.in_path)
+	
+	_schedule(jobs)
+	_run_jobs(jobs, worker_count, global_dependencies)
+	
+	compiled_count = sum(1 for i in jobs if i.compiled)
+	restored_count = sum(1 for i in jobs if i.restored)
+	failed_jobs = [i for i in jobs if i.error is not None]
+	
+	print '[openscad] {} compiled, {} restored from the cache, {} up-to-date, {} failed, {} processes, {:.1f} s'.format(
+		compiled_count - restored_count,
+		restored_count,
+		len(jobs) - compiled_count - len(failed_jobs),
+		len(failed_jobs),
+		worker_count,
+		time.time() - start_time)
+	
+	for i in failed_jobs:
+		if i.started:
+			print >> sys.stderr, 'Failed: {}: {} See {}.'.format(i.out_path, i.error, i.log_path)
+		else:
+			print >> sys.stderr, 'Failed: {}: {}'.format(i.out_path, i.error)
+	
+	if failed_jobs:
+		raise util.UserError('{} of {} targets failed.', len(failed_jobs), len(jobs))
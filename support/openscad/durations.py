@@ -0,0 +1,123 @@
+import os, re, sqlite3, contextlib
+from lib import util
+
+
+# Database in which the duration of the last compilations of each target is recorded.
+_database_path = 'build/compile-times.sqlite'
+
+# Weight of the latest duration in the recorded average, so that e.g. changes to _fillygon.scad are picked up after a single run.
+_latest_weight = 0.5
+
+# Complexity assumed for files not rendering any fillygons.
+_min_complexity = 1
+
+_edges_pattern = re.compile(r'\bedges\s*=\s*\[([^\]]*)\]')
+_fn_pattern = re.compile(r'\bfn\s*=\s*([0-9.]+)')
+_default_fn = 32
+
+
+@contextlib.contextmanager
+def _connect():
+	dir = os.path.dirname(_database_path)
+	
+	if not os.path.exists(dir):
+		try:
+			os.makedirs(dir)
+		except OSError:
+			# Created by another process in the meantime.
+			pass
+	
+	# Uses a long timeout as many compilations may finish at the same time when running make with -j.
+	connection = sqlite3.connect(_database_path, timeout = 60)
+	
+	try:
+		connection.execute('create table if not exists durations (target text primary key, duration real not null, complexity real not null)')
+		
+		with connection:
+			yield connection
+	finally:
+		connection.close()
+
+
+def estimate_complexity(in_path):
+	"""
+	Estimate the time needed to compile an OpenSCAD file relative to other files, from the number of edges of the fillygons it renders and the value of fn used for them.
+	"""
+	
+	content = util.read_file(in_path).decode()
+	fns = [float(i) for i in _fn_pattern.findall(content)]
+	complexity = 0
+	
+	for i, edges in enumerate(_edges_pattern.findall(content)):
+		fn = fns[i] if i < len(fns) else _default_fn
+		complexity += (edges.count(',') + 1) * fn
+	
+	return max(_min_complexity, complexity)
+
+
+def record(in_path, out_path, duration):
+	"""
+	Record the time it took to compile the specified file.
+	"""
+	
+	complexity = estimate_complexity(in_path)
+	
+	with _connect() as connection:
+		row = connection.execute('select duration from durations where target = ?', [out_path]).fetchone()
+		
+		if row is not None:
+			duration = _latest_weight * duration + (1 - _latest_weight) * row[0]
+		
+		connection.execute('insert or replace into durations values (?, ?, ?)', [out_path, duration, complexity])
+
+
+def predict_durations(targets):
+	"""
+	Return the predicted compile time of each of the specified targets, which are pairs of the source and target path.
+	
+	Targets which have been compiled before are predicted to take as long as they took on average. For all other targets, the time is estimated from the complexity of their source file, see estimate_complexity(), using the ratio of time per complexity seen for the recorded targets.
+	"""
+	
+	if not os.path.exists(_database_path):
+		recorded = { }
+	else:
+		with _connect() as connection:
+			recorded = { i: (d, c) for i, d, c in connection.execute('select target, duration, complexity from durations') }
+	
+	total_duration = sum(d for d, _ in recorded.values())
+	total_complexity = sum(c for _, c in recorded.values())
+	
+	# Only the relative order matters when nothing has been recorded yet.
+	seconds_per_complexity = total_duration / total_complexity if total_complexity else 1
+	
+	def predict(in_path, out_path):
+		if out_path in recorded:
+			return recorded[out_path][0]
+		elif os.path.exists(in_path):
+			return estimate_complexity(in_path) * seconds_per_complexity
+		else:
+			# Generated later, so nothing is known about it.
+			return 0
+	
+	return [predict(*i) for i in targets]
+
+
+def order_by_duration(items, targets):
+	"""
+	Return the items ordered by the predicted compile time of the corresponding targets, longest first. Items with the same prediction keep their order.
+	"""
+	
+	durations = predict_durations(targets)
+	
+	return [item for _, item in sorted(zip(durations, items), key = lambda x: -x[0])]
+
+
+@util.main
+def main(makefile_path, *out_paths):
+	"""
+	Write a Makefile fragment to makefile_path, which sets ORDERED_STL_FILES to the specified STL or DXF targets ordered by their predicted compile time, longest first, see predict_durations().
+	"""
+	
+	targets = [(os.path.splitext(i)[0] + '.scad', i) for i in out_paths]
+	
+	util.write_file(makefile_path, 'ORDERED_STL_FILES := {}\n'.format(' '.join(order_by_duration(out_paths, targets))))